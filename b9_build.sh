@@ -285,7 +285,7 @@ import sys
 sys.path.insert(0, '$B9_DIR')
 # Test all stdlib imports used by the app
 import subprocess, threading, os, re, random, time
-import socket, queue, struct, glob, json, sys, ctypes
+import socket, queue, struct, glob, json, sys, ctypes, sqlite3
 print('  stdlib: OK')
 import vosk
 print('  vosk: OK')
@@ -341,7 +341,7 @@ Restart=on-failure
 RestartSec=5
 StartLimitBurst=5
 StartLimitIntervalSec=60
-Environment="OLLAMA_MAX_LOADED_MODELS=1"
+Environment="OLLAMA_MAX_LOADED_MODELS=2"
 Environment="OLLAMA_NUM_PARALLEL=1"
 Environment="OLLAMA_FLASH_ATTENTION=1"
 SVCEOF
@@ -1,56 +1,22 @@
 #!/usr/bin/env python3
 """
 B-9 Class M-3 General Utility Non-Theorizing Environmental Control Robot
-Production architecture: single AI worker queue, watchdog, no manual model swapping
+Production architecture: dual-lane AI executor under a memory budget, watchdog,
+no manual model swapping
 """
 
 import subprocess, threading, os, re, random, time
-import socket, queue, struct, glob, json, sys
+import socket, queue, struct, glob, json, sys, sqlite3, shlex
+import collections, itertools, linecache, weakref, array, math
+import binascii, tracemalloc
 
 # ─── Suppress ALSA noise ───────────────────────────────────────────────────────
-import ctypes
-try:
-    ctypes.cdll.LoadLibrary('libasound.so.2').snd_lib_error_set_handler(None)
-except:
-    pass
-
-# ─── Hardware Detection ────────────────────────────────────────────────────────
-print("[B-9] Initializing...")
-
-ESPEAK_AVAILABLE = False
-ESPEAK_EXE = 'espeak-ng'
-for _exe in ['espeak-ng', 'espeak']:
+def _quiet_alsa():
+    import ctypes
     try:
-        subprocess.run([_exe, '--version'], capture_output=True, timeout=3)
-        ESPEAK_AVAILABLE = True
-        ESPEAK_EXE = _exe
-        print(f"[B-9] TTS: {_exe}")
-        break
+        ctypes.cdll.LoadLibrary('libasound.so.2').snd_lib_error_set_handler(None)
     except:
-        continue
-
-CAMERA_AVAILABLE = False
-try:
-    import cv2
-    for _idx in range(4):
-        _c = cv2.VideoCapture(_idx)
-        if _c.isOpened():
-            _r, _f = _c.read()
-            _c.release()
-            if _r and _f is not None:
-                CAMERA_AVAILABLE = True
-                print(f"[B-9] Camera: /dev/video{_idx} ({_f.shape[1]}x{_f.shape[0]})")
-                break
-        else:
-            _c.release()
-except ImportError:
-    print("[B-9] Camera: cv2 not installed")
-
-try:
-    import vosk
-    print("[B-9] Vosk: installed")
-except ImportError:
-    print("[B-9] Vosk: NOT installed")
+        pass
 
 # ─── Audio Card Detection ──────────────────────────────────────────────────────
 def _find_audio_cards():
@@ -77,17 +43,7 @@ def _find_audio_cards():
     if spk is None: spk = mic
     return spk, mic
 
-_SPEAKER_CARD, _MIC_CARD = _find_audio_cards()
-print(f"[B-9] Audio: speaker={_SPEAKER_CARD}  mic={_MIC_CARD}")
-
 # ─── Ollama Model Detection ────────────────────────────────────────────────────
-def _list_models():
-    try:
-        r = subprocess.run(['ollama', 'list'], capture_output=True, text=True, timeout=8)
-        return [l.split()[0] for l in r.stdout.strip().split('\n')[1:] if l.strip()]
-    except:
-        return []
-
 def _pick(prefs, installed):
     for p in prefs:
         for m in installed:
@@ -95,13 +51,54 @@ def _pick(prefs, installed):
                 return m
     return installed[0] if installed else None
 
-_models      = _list_models()
-VISION_MODEL = _pick(['moondream','llava-phi3','llava','minicpm-v'], _models)
-CHAT_MODEL   = _pick(['qwen2.5','qwen2','llama','mistral','phi'],
-                     [m for m in _models if m != VISION_MODEL]) or VISION_MODEL
+# Resolved from the installed models on first use (see _resolve_models);
+# B9_CHAT_MODEL / B9_VISION_MODEL pin them instead.
+CHAT_MODEL   = os.environ.get("B9_CHAT_MODEL")
+VISION_MODEL = os.environ.get("B9_VISION_MODEL")
+_models_resolved = False
+_models_tried    = 0.0     # last time the model list was probed
+_models_lock     = threading.Lock()
+MODEL_RETRY      = 30      # seconds between probes until models resolve
+
+def _resolve_models(force=False):
+    """
+    Pick chat/vision models from the Ollama backend once it answers.
+    Probes at most every MODEL_RETRY s and never waits on another thread's
+    probe, so a hung Ollama cannot stall the callers (the watchdog retries
+    with force=True).
+    """
+    global CHAT_MODEL, VISION_MODEL, _models_resolved, _models_tried
+    if _models_resolved:
+        return
+    if not force and time.time() - _models_tried < MODEL_RETRY:
+        return
+    if not _models_lock.acquire(blocking=False):
+        return
+    try:
+        if _models_resolved:
+            return
+        _models_tried = time.time()
+        installed = hw().ollama.list_models()
+        if not installed and not (CHAT_MODEL and VISION_MODEL):
+            return   # Ollama not up yet — try again on next use
+        VISION_MODEL = VISION_MODEL or _pick(
+            ['moondream', 'llava-phi3', 'llava', 'minicpm-v'], installed)
+        CHAT_MODEL   = CHAT_MODEL or _pick(
+            ['qwen2.5', 'qwen2', 'llama', 'mistral', 'phi'],
+            [m for m in installed if m != VISION_MODEL]) or VISION_MODEL
+        _models_resolved = True
+        print(f"[B-9] Chat:   {CHAT_MODEL}")
+        print(f"[B-9] Vision: {VISION_MODEL or 'NONE'}")
+    finally:
+        _models_lock.release()
+
+def chat_model():
+    _resolve_models()
+    return CHAT_MODEL
 
-print(f"[B-9] Chat:   {CHAT_MODEL}")
-print(f"[B-9] Vision: {VISION_MODEL or 'NONE'}")
+def vision_model():
+    _resolve_models()
+    return VISION_MODEL
 
 # ─── Constants ────────────────────────────────────────────────────────────────
 ESPEAK_PITCH = 35
@@ -109,13 +106,68 @@ ESPEAK_SPEED = 128
 ESPEAK_AMP   = 185
 ESPEAK_GAP   = 9
 WAKE_WORDS   = ["robot", "b9", "b-9", "hey robot", "danger", "warning"]
+SCAN_PHRASES = ['what do you see', 'what can you see', 'look around',
+                'scan', 'optical scan', 'what is in front',
+                'describe surroundings', 'camera', 'take a look']
+STOP_COMMANDS    = {'stop', 'quiet', 'be quiet', 'silence', 'cancel',
+                    'shut up', 'enough'}
+BUILTIN_COMMANDS = {'ping', 'status', 'systems', 'report', 'clear',
+                    'hello', 'hi', 'hey', 'greetings', 'help'} | STOP_COMMANDS
+
+# Barge-in: while B-9 talks, a wake word only interrupts it when the mic level
+# is well above the speaker's own echo (the USB device has no echo canceller)
+BARGE_IN_RMS  = int(os.environ.get("B9_BARGE_IN_RMS", "1500"))  # 16-bit RMS floor
+BARGE_IN_ECHO = 2.5    # × echo peak learned from every playback chunk
+BARGE_IN_CALIBRATE = 3 # chunks (~0.75s) at the start of each utterance that
+                       # only learn the echo level and never barge in
+BARGE_IN_DECAY = 0.95  # per chunk decay of the learned echo peak
 
 OLLAMA_URL   = "http://localhost:11434"
+OLLAMA_TIMEOUT        = 120   # seconds per inference HTTP request
+OLLAMA_HEALTH_TIMEOUT = 5     # seconds for the /api/tags health probe
+OLLAMA_RESTART_WAIT   = 20    # seconds to wait for the API after a restart
+# Pluggable so recovery can be exercised without systemd (b9_fault_harness.py)
+OLLAMA_RESTART_CMD    = shlex.split(os.environ.get(
+    "B9_OLLAMA_RESTART_CMD", "sudo systemctl restart ollama"))
+WATCHDOG_DELAY        = 60    # grace period after boot before the first ping
+WATCHDOG_INTERVAL     = 30    # seconds between health pings
+AI_RETRY_DELAY        = 2     # pause before retrying a failed inference
+AI_PRIORITY           = 5     # default request priority, 0 = most urgent … 9
+
+# Dual-lane AI executor: chat and vision run in parallel only while the summed
+# model footprints measured via /api/ps fit the budget (serial until measured)
+AI_MEMORY_BUDGET_MB = int(os.environ.get("B9_AI_MEMORY_MB", "3000"))
+MODEL_FOOTPRINT_MB  = {"chat": 900, "vision": 1700}   # per-lane defaults
+
+# Speculative voice path: act on Vosk partials instead of waiting for silence
+WARM_INTERVAL      = 60   # min seconds between warm-up requests per model
+PREFETCH_MAX_AGE   = 10   # seconds a prefetched camera frame stays usable
+SPECULATE_STABLE   = 3    # unchanged partials (~0.25s each) before dispatch
 # Reduced context: saves ~60MB VRAM vs 512, safe for 3-turn robot conversation
 CHAT_OPTIONS = {"temperature": 0.7, "num_predict": 120,
                 "num_ctx": 384, "num_keep": 48}
 VIS_OPTIONS  = {"temperature": 0.2, "num_predict": 100,
                 "num_ctx": 384, "stop": ["Question:"]}
+VISION_WIDTH   = 320    # frames are downscaled to this width before JPEG
+VISION_QUALITY = 80     # JPEG quality sent to the vision model
+VISION_TRACE_ALLOC = os.environ.get("B9_TRACE_ALLOC") == "1"  # tracemalloc peak per scan
+
+# Durable memory: relevant past exchanges replace the last-N history in prompts
+MEMORY_DB     = os.environ.get("B9_MEMORY_DB", "/opt/b9robot/b9_memory.db")
+MEMORY_RECALL = 2      # past exchanges recalled into each chat prompt
+MEMORY_MIN_MATCH = 2   # query words a recalled exchange must share (fewer
+                       # only when the query itself has fewer)
+# B9_BRAIN alone is ~300 of num_ctx's 384 tokens: history is capped in chars
+# (~4 per token) so it cannot push the question out of the context
+MEMORY_CONTEXT_CHARS = 480   # all history messages in one prompt
+MEMORY_TURN_CHARS    = 160   # any single history message
+MEMORY_MAX    = 5000   # exchanges kept on disk before the oldest are pruned
+
+DELAY_RESPONSE    = "This unit is experiencing a processing delay. Stand by."
+DEGRADED_RESPONSE = ("This unit's cognitive systems are temporarily offline. "
+                     "Standing by for recovery.")
+NO_CAMERA_RESPONSE    = "Warning. Optical sensors offline. No camera detected."
+CAMERA_FAULT_RESPONSE = "Optical sensor malfunction. Camera not responding."
 
 B9_BRAIN = (
     "You ARE the B-9 Class M-3 General Utility Non-Theorizing Environmental "
@@ -143,145 +195,948 @@ B9_BRAIN = (
     "'Affirmative.' / 'Negative.' / 'Insufficient data.'"
 )
 
-# ─── Speaking State ────────────────────────────────────────────────────────────
-_b9_speaking = False   # True while espeak is playing — mic ignores input
+# Structured events: ring buffer in RAM, flushed to JSON lines off the hot path
+EVENT_LOG      = os.environ.get("B9_EVENT_LOG", "/opt/b9robot/logs/b9_events.jsonl")
+EVENT_RING     = 4096              # events kept in RAM for the TCP 'dump' command
+EVENT_LOG_MAX  = 5 * 1024 * 1024   # bytes before the JSON-lines file rotates
+EVENT_LOG_KEEP = 3                 # rotated files kept (.1 newest … .3 oldest)
+EVENT_ECHO     = os.environ.get("B9_EVENT_ECHO") == "1"   # print every event
 
-def speak(text):
-    global _b9_speaking
-    if not text:
-        return
-    clean = re.sub(r'[*_`#\[\]()]', '', text)
-    clean = re.sub(r'\n+', '. ', clean).strip()
-    print(f"\n[B-9 SPEAKS] {clean}\n")
-    if not ESPEAK_AVAILABLE:
-        return
-    dev = f"plughw:{_SPEAKER_CARD},0" if _SPEAKER_CARD is not None else "default"
-    _b9_speaking = True
+PROFILE_HZ    = 100   # stack samples per second while the profiler runs
+PROFILE_MAX_S = 60    # longest profile accepted over TCP
+
+TCP_PROTOCOL    = 2    # newest protocol offered on port 5000 (1 = plain lines)
+TCP_V2_INFLIGHT = 16   # concurrent asks per v2 connection
+
+# ─── Event Log ────────────────────────────────────────────────────────────────
+#
+# Producers append a tuple to a bounded deque: one atomic C call under the GIL,
+# no locks and no I/O. The Event-Log thread copies new records out once a
+# second and appends them to EVENT_LOG. If producers outrun the flusher the
+# ring overwrites the oldest records and the gap is logged as 'dropped'.
+# A producer can be preempted between taking its seq and appending, so the
+# ring is not strictly in seq order; the flusher waits for such holes to fill.
+#
+_event_ring = collections.deque(maxlen=EVENT_RING)
+_event_seq  = itertools.count(1)
+_request_id = itertools.count(1)
+
+def new_request_id():
+    return next(_request_id)
+
+def log_event(subsys, event, rid=None, echo=False, **fields):
+    """Record one structured event. echo=True also prints it (warnings)."""
+    _event_ring.append((next(_event_seq), time.time(), subsys, event, rid, fields))
+    if echo or EVENT_ECHO:
+        tag = f" rid={rid}" if rid is not None else ""
+        print(f"[{subsys.upper()}] {event}{tag} " +
+              ' '.join(f"{k}={v}" for k, v in fields.items()))
+
+def _event_dict(rec):
+    seq, ts, subsys, event, rid, fields = rec
+    d = {"seq": seq, "ts": round(ts, 3), "sub": subsys, "ev": event}
+    if rid is not None:
+        d["rid"] = rid
+    d.update(fields)
+    return d
+
+def _event_snapshot():
+    while True:
+        try:
+            return list(_event_ring)
+        except RuntimeError:   # deque mutated during copy — retry
+            continue
+
+def dump_events(n=50, subsys=None, rid=None):
+    """Last n events (oldest first), optionally filtered by subsystem / id."""
+    recs = _event_snapshot()
+    if subsys:
+        recs = [r for r in recs if r[2] == subsys]
+    if rid is not None:
+        recs = [r for r in recs if str(r[4]) == str(rid)]
+    if n <= 0:
+        return []
+    return [_event_dict(r) for r in recs[-n:]]
+
+def _rotate_events():
+    for i in range(EVENT_LOG_KEEP - 1, 0, -1):
+        if os.path.exists(f"{EVENT_LOG}.{i}"):
+            os.replace(f"{EVENT_LOG}.{i}", f"{EVENT_LOG}.{i+1}")
+    os.replace(EVENT_LOG, f"{EVENT_LOG}.1")
+
+def _event_flusher():
+    """Background thread: appends new ring records to EVENT_LOG every second."""
     try:
-        ep = subprocess.Popen(
-            [ESPEAK_EXE, '-v', 'en', '-p', str(ESPEAK_PITCH),
-             '-s', str(ESPEAK_SPEED), '-a', str(ESPEAK_AMP),
-             '-g', str(ESPEAK_GAP), '--stdout', clean],
-            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
-        ap = subprocess.Popen(
-            ['aplay', '-D', dev, '-r', '22050', '-f', 'S16_LE', '-c', '1', '-q'],
-            stdin=ep.stdout, stderr=subprocess.DEVNULL)
-        ep.stdout.close()
-        ap.communicate(timeout=60)
-    except subprocess.TimeoutExpired:
-        try: ep.kill(); ap.kill()
-        except: pass
-    except Exception:
+        os.makedirs(os.path.dirname(EVENT_LOG) or '.', exist_ok=True)
+    except Exception as e:
+        print(f"[EVENTS] File logging disabled: {e}")
+        return
+    last  = 0       # every seq up to here has been written
+    ahead = set()   # seqs written past a hole below them
+    while True:
+        time.sleep(1)
+        snap = _event_snapshot()
+        recs = sorted((r for r in snap if r[0] > last and r[0] not in ahead),
+                      key=lambda r: r[0])
+        if not recs:
+            continue
+        lines  = []
+        oldest = min(r[0] for r in snap)
+        if oldest > last + 1:
+            # Holes below the oldest ring record were overwritten, not late
+            gone  = [s for s in ahead if s < oldest]
+            count = oldest - last - 1 - len(gone)
+            if count:
+                lines.append(json.dumps({"ts": round(recs[0][1], 3),
+                                         "sub": "events", "ev": "dropped",
+                                         "count": count}))
+            ahead.difference_update(gone)
+            last = oldest - 1
+        lines += [json.dumps(_event_dict(r), default=str) for r in recs]
+        ahead.update(r[0] for r in recs)
+        while last + 1 in ahead:
+            last += 1
+            ahead.discard(last)
         try:
-            subprocess.run([ESPEAK_EXE, '-v', 'en', '-p', str(ESPEAK_PITCH),
-                            '-s', str(ESPEAK_SPEED), '-a', str(ESPEAK_AMP),
-                            '-g', str(ESPEAK_GAP), clean],
-                           timeout=60, capture_output=True)
+            with open(EVENT_LOG, 'a') as f:
+                f.write('\n'.join(lines) + '\n')
+            if os.path.getsize(EVENT_LOG) > EVENT_LOG_MAX:
+                _rotate_events()
+        except Exception as e:
+            print(f"[EVENTS] Write error: {e}")
+
+# ─── Hardware Backends ────────────────────────────────────────────────────────
+#
+# Every device B-9 touches sits behind a small backend. Nothing is probed at
+# import: each backend is built (and probes its device) on first use through
+# hw(). B9_BACKEND=sim (or --sim) swaps in simulated backends so the brain and
+# AI pipeline run headless in tests, benchmarks or a multi-instance host.
+#
+#   tts      .available, .card, play(text) → playback
+#            playback.wait(timeout) → finished?, playback.stop()
+#   mic      .card, has_input(), open() → stream   stream.read(n), close()
+#            redetect()                            after USB re-enumeration
+#   camera   available(), refresh(), capture()     BGR frame or None
+#   keypad   start(on_key)                         on_key(code, device)
+#   ollama   post(), stream() → JSON chunks, get(), healthy(),
+#            list_models(), restart()
+#
+SIM_SPEED = float(os.environ.get("B9_SIM_SPEED", "1"))   # sim delays ×, 0 = instant
+
+# ── Real hardware ──
+class EspeakTTS:
+    def __init__(self):
+        self.exe = None
+        for exe in ['espeak-ng', 'espeak']:
+            try:
+                subprocess.run([exe, '--version'], capture_output=True, timeout=3)
+                self.exe = exe
+                print(f"[B-9] TTS: {exe}")
+                break
+            except:
+                continue
+        self.available = self.exe is not None
+        self.card      = _find_audio_cards()[0]
+
+    def _args(self):
+        return [self.exe, '-v', 'en', '-p', str(ESPEAK_PITCH),
+                '-s', str(ESPEAK_SPEED), '-a', str(ESPEAK_AMP),
+                '-g', str(ESPEAK_GAP)]
+
+    def play(self, text):
+        """Start espeak | aplay; falls back to espeak's own audio output."""
+        dev = f"plughw:{self.card},0" if self.card is not None else "default"
+        procs = []
+        try:
+            procs.append(subprocess.Popen(
+                self._args() + ['--stdout', text],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL))
+            procs.append(subprocess.Popen(
+                ['aplay', '-D', dev, '-r', '22050', '-f', 'S16_LE', '-c', '1', '-q'],
+                stdin=procs[0].stdout, stderr=subprocess.DEVNULL))
+            procs[0].stdout.close()
+            return _ProcPlayback(procs)
+        except Exception:
+            _ProcPlayback(procs).stop()
+        try:
+            return _ProcPlayback([subprocess.Popen(
+                self._args() + [text],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)])
+        except Exception:
+            return _ProcPlayback([])
+
+class _ProcPlayback:
+    """Playback by a pipeline of processes; the last one finishing ends it."""
+    def __init__(self, procs):
+        self.procs   = procs
+        self.stopped = False
+
+    def wait(self, timeout):
+        try:
+            for p in reversed(self.procs):
+                p.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.stop()
+        return not self.stopped
+
+    def stop(self):
+        self.stopped = True
+        for p in self.procs:
+            try: p.kill()
+            except: pass
+
+class PyAudioMic:
+    def __init__(self):
+        _quiet_alsa()
+        self.card = _find_audio_cards()[1]
+
+    def redetect(self):
+        mic = _find_audio_cards()[1]
+        if mic is not None:
+            self.card = mic
+
+    def has_input(self):
+        import pyaudio as _pa
+        p = _pa.PyAudio()
+        try:
+            return any(p.get_device_info_by_index(i)['maxInputChannels'] > 0
+                       for i in range(p.get_device_count()))
+        finally:
+            p.terminate()
+
+    def open(self):
+        import pyaudio as _pa
+        p = _pa.PyAudio()
+        card = self.card if self.card is not None else 1
+        target = None
+        for i in range(p.get_device_count()):
+            info = p.get_device_info_by_index(i)
+            if (info['maxInputChannels'] > 0 and
+                    (str(card) in info['name'] or
+                     'webcam' in info['name'].lower() or
+                     'usb' in info['name'].lower())):
+                target = i; break
+        if target is None:
+            for i in range(p.get_device_count()):
+                if p.get_device_info_by_index(i)['maxInputChannels'] > 0:
+                    target = i; break
+        try:
+            stream = p.open(format=_pa.paInt16, channels=1, rate=16000,
+                            input=True, input_device_index=target,
+                            frames_per_buffer=4096)
+        except:
+            p.terminate()
+            raise
+        return _PyAudioStream(p, stream)
+
+class _PyAudioStream:
+    def __init__(self, p, stream):
+        self.p, self.stream = p, stream
+
+    def read(self, n):
+        return self.stream.read(n, exception_on_overflow=False)
+
+    def close(self):
+        try:
+            self.stream.stop_stream(); self.stream.close()
+        finally:
+            self.p.terminate()
+
+class OpenCVCamera:
+    def __init__(self):
+        self._available = None
+
+    def available(self):
+        if self._available is None:
+            self.refresh()
+        return self._available
+
+    def refresh(self):
+        """Probe /dev/video0-3 for a camera that returns frames."""
+        self._available = False
+        try:
+            import cv2
+        except ImportError:
+            print("[B-9] Camera: cv2 not installed")
+            return False
+        for idx in range(4):
+            c = cv2.VideoCapture(idx)
+            if c.isOpened():
+                r, f = c.read()
+                c.release()
+                if r and f is not None:
+                    self._available = True
+                    print(f"[B-9] Camera: /dev/video{idx} ({f.shape[1]}x{f.shape[0]})")
+                    break
+            else:
+                c.release()
+        return self._available
+
+    def capture(self):
+        """Capture one stable frame. Returns numpy array or None."""
+        try:
+            import cv2
+        except ImportError:
+            return None
+        for idx in range(4):
+            try:
+                c = cv2.VideoCapture(idx)
+                if c.isOpened():
+                    for _ in range(3): c.read()   # flush auto-exposure
+                    ret, f = c.read()
+                    c.release()
+                    if ret and f is not None:
+                        return f
+            except: continue
+        return None
+
+class EvdevKeypad:
+    def start(self, on_key):
+        devs = glob.glob('/dev/input/event*')
+        if not devs:
+            print("[KEYPAD] No input devices (keypad not connected)")
+            return
+        for dev in devs:
+            threading.Thread(target=self._watch, args=(dev, on_key), daemon=True,
+                             name=f"Keypad-{os.path.basename(dev)}").start()
+        print(f"[KEYPAD] Watching {len(devs)} device(s)")
+
+    def _watch(self, dev, on_key):
+        try:
+            with open(dev, 'rb') as f:
+                while True:
+                    raw = f.read(24)
+                    if len(raw) < 24: continue
+                    _, _, ev_type, ev_code, ev_value = struct.unpack('llHHI', raw)
+                    if ev_type == 1 and ev_value == 1:
+                        on_key(ev_code, dev)
         except: pass
-    finally:
-        time.sleep(0.3)   # echo decay before mic re-opens
-        _b9_speaking = False
 
-def speak_bg(text):
-    threading.Thread(target=speak, args=(text,), daemon=True).start()
-
-# ─── Ollama HTTP helpers ───────────────────────────────────────────────────────
-def _post(endpoint, payload_dict, timeout=120):
-    """Single HTTP POST to Ollama. Returns parsed JSON or None."""
-    import urllib.request, urllib.error
-    data = json.dumps(payload_dict).encode()
-    req  = urllib.request.Request(
-        f"{OLLAMA_URL}{endpoint}", data=data,
-        headers={"Content-Type": "application/json"}, method="POST")
-    try:
-        with urllib.request.urlopen(req, timeout=timeout) as r:
-            return json.loads(r.read())
-    except urllib.error.HTTPError as e:
-        print(f"[AI] HTTP {e.code}: {e.read().decode()[:120]}")
+def _json_chunks(payload_dict):
+    """
+    JSON body as a list of byte chunks. Bytes-like values (the base64 image
+    buffer) are spliced in as their own chunk rather than decoded to str
+    and copied through json.dumps; they must not need JSON escaping.
+    """
+    raw = []
+    def _mark(o):
+        if isinstance(o, (bytes, bytearray, memoryview)):
+            raw.append(o)
+            return f"\0{len(raw) - 1}\0"
+        raise TypeError(f"not JSON serializable: {type(o).__name__}")
+    text = json.dumps(payload_dict, default=_mark)
+    if not raw:
+        return [text.encode()]
+    parts  = re.split(r'\\u0000(\d+)\\u0000', text)
+    chunks = [parts[0].encode()]
+    for i in range(1, len(parts), 2):
+        chunks += [raw[int(parts[i])], parts[i + 1].encode()]
+    return chunks
+
+class HTTPOllama:
+    def _request(self, endpoint, payload_dict):
+        import urllib.request
+        chunks = _json_chunks(payload_dict)
+        return urllib.request.Request(
+            f"{OLLAMA_URL}{endpoint}",
+            data=chunks[0] if len(chunks) == 1 else chunks,
+            headers={"Content-Type": "application/json",
+                     "Content-Length": str(sum(len(c) for c in chunks))},
+            method="POST")
+
+    def post(self, endpoint, payload_dict, timeout):
+        """Single HTTP POST to Ollama. Returns parsed JSON or None."""
+        import urllib.request, urllib.error
+        req = self._request(endpoint, payload_dict)
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as r:
+                return json.loads(r.read())
+        except urllib.error.HTTPError as e:
+            log_event('ai', 'http_error', echo=True, endpoint=endpoint,
+                      code=e.code, body=e.read().decode()[:120])
+            return None
+        except Exception as e:
+            log_event('ai', 'request_error', echo=True, endpoint=endpoint,
+                      error=str(e))
+            return None
+
+    def stream(self, endpoint, payload_dict, timeout):
+        """
+        Streaming HTTP POST ("stream": true). Yields each JSON line as it
+        arrives; closing the generator drops the connection, which stops
+        generation in Ollama.
+        """
+        import urllib.request, urllib.error
+        req = self._request(endpoint, payload_dict)
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as r:
+                for line in r:
+                    if line.strip():
+                        yield json.loads(line)
+        except urllib.error.HTTPError as e:
+            log_event('ai', 'http_error', echo=True, endpoint=endpoint,
+                      code=e.code, body=e.read().decode()[:120])
+        except Exception as e:
+            log_event('ai', 'request_error', echo=True, endpoint=endpoint,
+                      error=str(e))
+
+    def get(self, endpoint, timeout):
+        """Single HTTP GET to Ollama. Returns parsed JSON or None."""
+        import urllib.request
+        try:
+            with urllib.request.urlopen(f"{OLLAMA_URL}{endpoint}",
+                                        timeout=timeout) as r:
+                return json.loads(r.read())
+        except Exception as e:
+            log_event('ai', 'request_error', endpoint=endpoint, error=str(e))
+            return None
+
+    def healthy(self):
+        """Quick health check — returns True if Ollama API responds."""
+        import urllib.request
+        try:
+            urllib.request.urlopen(f"{OLLAMA_URL}/api/tags",
+                                   timeout=OLLAMA_HEALTH_TIMEOUT)
+            return True
+        except:
+            return False
+
+    def list_models(self):
+        tags = self.get("/api/tags", OLLAMA_HEALTH_TIMEOUT) or {}
+        return [m['name'] for m in tags.get('models', []) if m.get('name')]
+
+    def restart(self):
+        try:
+            subprocess.run(OLLAMA_RESTART_CMD, timeout=15, capture_output=True)
+        except:
+            try:
+                subprocess.run(['pkill', '-f', 'ollama'],
+                               timeout=5, capture_output=True)
+                time.sleep(2)
+                subprocess.Popen(['ollama', 'serve'],
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            except: pass
+
+# ── Simulated hardware ──
+def _sim_sleep(seconds):
+    if SIM_SPEED > 0:
+        time.sleep(seconds * SIM_SPEED)
+
+class SimTTS:
+    """Silent speech that takes as long as espeak would."""
+    available = True
+    card      = None
+
+    def play(self, text):
+        return _SimPlayback(len(text.split()) * 60 / ESPEAK_SPEED * SIM_SPEED)
+
+class _SimPlayback:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self._stop   = threading.Event()
+
+    def wait(self, timeout):
+        return not self._stop.wait(min(self.seconds, timeout))
+
+    def stop(self):
+        self._stop.set()
+
+class SimMic:
+    """Plays B9_SIM_AUDIO (16kHz mono S16 .wav/.raw) in real time, then silence."""
+    card = None
+
+    def has_input(self):
+        return True
+
+    def redetect(self):
+        pass
+
+    def open(self):
+        return _SimStream(os.environ.get("B9_SIM_AUDIO"))
+
+class _SimStream:
+    def __init__(self, path):
+        self.pcm, self.pos = b'', 0
+        if path and path.endswith('.wav'):
+            import wave
+            with wave.open(path) as w:
+                self.pcm = w.readframes(w.getnframes())
+        elif path:
+            self.pcm = open(path, 'rb').read()
+
+    def read(self, n):
+        _sim_sleep(n / 16000)
+        chunk = self.pcm[self.pos:self.pos + 2 * n]
+        self.pos += 2 * n
+        return chunk + b'\0' * (2 * n - len(chunk))
+
+    def close(self):
+        pass
+
+class SimCamera:
+    """1080p synthetic test pattern (the vision pipeline needs cv2 + numpy)."""
+    def available(self):
+        try:
+            import cv2
+            return True
+        except ImportError:
+            return False
+
+    def refresh(self):
+        return self.available()
+
+    def capture(self):
+        try:
+            import numpy as np
+        except ImportError:
+            return None
+        _sim_sleep(0.1)
+        frame = np.zeros((1080, 1920, 3), np.uint8)
+        frame[:, :, 1] = np.arange(1920, dtype=np.uint16) % 256
+        frame[:, :, 2] = (np.arange(1080, dtype=np.uint16) % 256)[:, None]
+        return frame
+
+class SimKeypad:
+    """Key presses are injected with press(code)."""
+    def __init__(self):
+        self.on_key = None
+
+    def start(self, on_key):
+        self.on_key = on_key
+
+    def press(self, code):
+        if self.on_key:
+            self.on_key(code, 'sim')
+
+class SimOllama:
+    """In-process Ollama: deterministic replies, fixed latencies, never fails."""
+    MODELS = {'qwen2.5:sim': 400, 'moondream:sim': 1700}   # name → MB
+
+    def __init__(self):
+        self.loaded = set()
+
+    def post(self, endpoint, payload_dict, timeout):
+        model = payload_dict.get('model')
+        if model not in self.loaded:
+            _sim_sleep(1.0)   # model load
+            self.loaded.add(model)
+        if endpoint == '/api/chat':
+            _sim_sleep(0.5)
+            question = payload_dict['messages'][-1]['content']
+            return {"message": {"role": "assistant",
+                                "content": f"Affirmative. This unit has "
+                                           f"processed: {question}"},
+                    "done": True}
+        if endpoint == '/api/generate':
+            if payload_dict.get('keep_alive') == 0:
+                self.loaded.discard(model)
+            if payload_dict.get('images'):
+                _sim_sleep(3.0)
+                return {"response": "A simulated test pattern of coloured "
+                                    "bars. No hazards are visible.",
+                        "done": True}
+            return {"response": "", "done": True, "done_reason": "load"}
         return None
-    except Exception as e:
-        print(f"[AI] Request error: {e}")
+
+    def stream(self, endpoint, payload_dict, timeout):
+        result = self.post(endpoint, dict(payload_dict, stream=False), timeout)
+        if not result:
+            return
+        key  = 'message' if endpoint == '/api/chat' else 'response'
+        text = (result[key]['content'] if key == 'message' else result[key])
+        for word in re.findall(r'\S+\s*', text):
+            _sim_sleep(0.05)
+            yield ({"message": {"role": "assistant", "content": word}}
+                   if key == 'message' else {"response": word})
+        yield {"done": True}
+
+    def get(self, endpoint, timeout):
+        if endpoint == '/api/tags':
+            return {"models": [{"name": m} for m in self.MODELS]}
+        if endpoint == '/api/ps':
+            return {"models": [{"name": m, "size": self.MODELS[m] * 1024 * 1024}
+                               for m in self.loaded if m in self.MODELS]}
         return None
 
+    def healthy(self):
+        return True
+
+    def list_models(self):
+        return list(self.MODELS)
+
+    def restart(self):
+        self.loaded.clear()
+
+# ── Registry ──
+_BACKENDS = {
+    'real': {'tts': EspeakTTS, 'mic': PyAudioMic, 'camera': OpenCVCamera,
+             'keypad': EvdevKeypad, 'ollama': HTTPOllama},
+    'sim':  {'tts': SimTTS, 'mic': SimMic, 'camera': SimCamera,
+             'keypad': SimKeypad, 'ollama': SimOllama},
+}
+
+class Hardware:
+    """Backend set of one kind; each backend is constructed on first access."""
+    def __init__(self, kind='real', **overrides):
+        if kind not in _BACKENDS:
+            raise ValueError(f"unknown backend kind: {kind}")
+        self.kind  = kind
+        self._made = dict(overrides)
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if name.startswith('_') or name not in _BACKENDS['real']:
+            raise AttributeError(name)
+        with self._lock:
+            if name not in self._made:
+                self._made[name] = _BACKENDS[self.kind][name]()
+            return self._made[name]
+
+_hw = None
+
+def hw():
+    """The process-wide backends (B9_BACKEND selects 'real' or 'sim')."""
+    global _hw
+    if _hw is None:
+        _hw = Hardware(os.environ.get("B9_BACKEND", "real"))
+    return _hw
+
+def use_hardware(kind='sim', **overrides):
+    """
+    Select backends before first use, e.g. use_hardware('sim') for headless
+    runs or use_hardware('real', tts=SimTTS()) to silence the speaker.
+    """
+    global _hw
+    _hw = Hardware(kind, **overrides)
+    return _hw
+
+# ─── Speech Output ────────────────────────────────────────────────────────────
+class SpeechOutput:
+    """
+    Plays one utterance at a time as a cancellable job and tracks the voice
+    requests B-9 is still answering, so a barge-in (PTT or a loud wake word)
+    stops playback and aborts the inference behind it straight away.
+    """
+    def __init__(self):
+        self._lock    = threading.Lock()
+        self._play    = threading.Lock()    # one utterance at a time
+        self._current = None                # (rid, playback) while playing
+        self._turns   = set()               # voice request ids being answered
+        self._epoch   = 0                   # bumped by barge_in()
+        self._dropped = collections.deque(maxlen=64)   # cancelled rids
+        self._quiet_until = 0.0             # echo decay after playback
+
+    def say(self, text, rid=None):
+        """Play text, blocking. False if it was cut off or dropped."""
+        epoch = self._epoch
+        with self._play:
+            with self._lock:
+                if epoch != self._epoch or (rid and rid in self._dropped):
+                    log_event('tts', 'dropped', rid)
+                    return False
+                playback = hw().tts.play(text)
+                self._current = (rid, playback)
+            try:
+                finished = playback.wait(60)
+            finally:
+                with self._lock:
+                    self._current = None
+                    self._quiet_until = time.time() + 0.3
+        return finished
+
+    def playing(self):
+        """True while speaking, and briefly after while the echo decays."""
+        return self._current is not None or time.time() < self._quiet_until
+
+    def busy(self):
+        """True while speaking or while a voice request is being answered."""
+        return self.playing() or bool(self._turns)
+
+    def hold(self, rid):
+        self._turns.add(rid)
+
+    def release(self, rid):
+        self._turns.discard(rid)
+
+    def cancel(self, rid):
+        """Stop rid's utterance (playing or waiting) and abort its inference."""
+        with self._lock:
+            self._dropped.append(rid)
+            current = self._current
+        if current and current[0] == rid:
+            current[1].stop()
+        cancel_request(rid)
+
+    def barge_in(self, source):
+        """Stop all speech and abort every voice request still in flight."""
+        with self._lock:
+            self._epoch += 1
+            current = self._current
+            rids    = set(self._turns)
+            self._quiet_until = 0.0
+        if current:
+            current[1].stop()
+            if current[0]: rids.add(current[0])
+        for rid in rids:
+            cancel_request(rid)
+        log_event('tts', 'barge_in', source=source, stopped=bool(current),
+                  cancelled=sorted(rids))
+        return bool(current or rids)
+
+_speech = SpeechOutput()
+
+def speak(text, rid=None):
+    """Say text, blocking until done. False if a barge-in cut it off."""
+    if not text:
+        return True
+    clean = re.sub(r'[*_`#\[\]()]', '', text)
+    clean = re.sub(r'\n+', '. ', clean).strip()
+    print(f"\n[B-9 SPEAKS] {clean}\n")
+    log_event('tts', 'speak', rid, chars=len(clean))
+    if not hw().tts.available:
+        return True
+    return _speech.say(clean, rid)
+
+def speak_bg(text):
+    threading.Thread(target=speak, args=(text,), daemon=True,
+                     name="Speak").start()
+
+# ─── Ollama helpers ───────────────────────────────────────────────────────────
+def _post(endpoint, payload_dict, timeout=None):
+    """Single POST to the Ollama backend. Returns parsed JSON or None."""
+    return hw().ollama.post(endpoint, payload_dict, timeout or OLLAMA_TIMEOUT)
+
+def _get(endpoint, timeout=None):
+    """Single GET to the Ollama backend. Returns parsed JSON or None."""
+    return hw().ollama.get(endpoint, timeout or OLLAMA_TIMEOUT)
+
+def _stream(endpoint, payload_dict, timeout=None):
+    """Streaming POST to the Ollama backend. Yields each JSON chunk."""
+    return hw().ollama.stream(endpoint, payload_dict, timeout or OLLAMA_TIMEOUT)
+
 def _ollama_healthy():
     """Quick health check — returns True if Ollama API responds."""
-    import urllib.request
-    try:
-        urllib.request.urlopen(f"{OLLAMA_URL}/api/tags", timeout=5)
-        return True
-    except:
-        return False
+    return hw().ollama.healthy()
 
-# ─── AI Worker Queue (serialized, single consumer) ────────────────────────────
+# ─── AI Executor (chat + vision lanes, memory budget) ─────────────────────────
 #
-# Architecture: producer/queue/consumer
-#   Any thread puts an AIRequest on _ai_queue.
-#   One dedicated worker thread processes them sequentially.
-#   No concurrent GPU allocations possible.
-#   Watchdog inside the worker restarts Ollama if it becomes unresponsive.
+# Architecture: producer/queue/consumer, one queue + worker thread per lane
+#   Any thread puts an AIRequest on its lane's queue ('chat' or 'vision').
+#   Each lane worker processes its queue sequentially.
+#   Before inferring, a worker admits itself against MemoryBudget: both lanes
+#   run in parallel only when both models fit, otherwise execution is serial.
+#   Each lane keeps its own retry → Ollama restart → degraded mode counter.
+#   Lane queues are ordered by priority, then arrival. A request with an
+#   on_event hook gets progress events ('queued', 'inferring', 'token',
+#   'aborted') and its chat streams, so a cancel or deadline stops it mid-reply.
 #
 class AIRequest:
-    def __init__(self, kind, payload, callback, timeout=30):
-        self.kind     = kind       # 'chat' | 'vision'
+    def __init__(self, kind, payload, callback, timeout=30, rid=None,
+                 lane=None, priority=AI_PRIORITY, on_event=None):
+        self.id       = rid or new_request_id()
+        self.kind     = kind       # 'chat' | 'vision' | 'warm'
+        self.lane     = lane or ('vision' if kind == 'vision' else 'chat')
         self.payload  = payload    # dict passed to the worker
         self.callback = callback   # fn(result: str) called with response
         self.timeout  = timeout    # seconds before request is dropped
+        self.priority = priority   # 0 runs first
+        self.on_event = on_event   # fn(event, **fields) progress hook
         self.ts       = time.time()
+        self.cancelled = False     # set by the producer — worker skips it
+        self.aborted   = None      # 'cancelled' | 'deadline' once abandoned
+
+    def expired(self):
+        return time.time() - self.ts > self.timeout
+
+    def notify(self, event, **fields):
+        if self.on_event:
+            try: self.on_event(event, **fields)
+            except Exception as e:
+                log_event('ai', 'hook_error', self.id, error=str(e))
+
+_ai_queues = {'chat': queue.PriorityQueue(), 'vision': queue.PriorityQueue()}
+_ai_order  = itertools.count()     # FIFO tie-break within a priority
+_inflight  = weakref.WeakValueDictionary()   # request id → queued AIRequest
+
+def ai_queue_depth():
+    return sum(q.qsize() for q in _ai_queues.values())
 
-_ai_queue = queue.Queue()
+class MemoryBudget:
+    """
+    Admits lane work while the summed model footprints fit budget_mb.
+    Admission is FIFO so a waiting vision scan is not starved by chats, and
+    a lane running alone is always admitted (oversize models go serial).
+    Until /api/ps has reported both models they are assumed not to fit.
+    """
+    def __init__(self, budget_mb):
+        self.budget_mb = budget_mb
+        self.measured  = {}                 # model name → MB from /api/ps
+        self._active   = {}                 # lane → MB held
+        self._waiting  = collections.deque()
+        self._cond     = threading.Condition()
+
+    def footprint(self, lane, model):
+        return self.measured.get(model, MODEL_FOOTPRINT_MB[lane])
+
+    def fits_all(self):
+        chat, vision = CHAT_MODEL, VISION_MODEL   # no probe: called under _cond
+        if chat not in self.measured or vision not in self.measured:
+            return False
+        return self.measured[chat] + self.measured[vision] <= self.budget_mb
+
+    def acquire(self, lane, mb):
+        """Blocks until lane may run. Returns seconds spent waiting."""
+        t0, me = time.time(), object()
+        with self._cond:
+            self._waiting.append(me)
+            while not (self._waiting[0] is me and
+                       (not self._active or
+                        (self.fits_all() and
+                         sum(self._active.values()) + mb <= self.budget_mb))):
+                self._cond.wait()
+            self._waiting.popleft()
+            self._active[lane] = mb
+            self._cond.notify_all()
+        return time.time() - t0
+
+    def release(self, lane):
+        with self._cond:
+            self._active.pop(lane, None)
+            self._cond.notify_all()
+
+    def measure(self):
+        """Record resident model sizes reported by Ollama's /api/ps."""
+        ps = _get("/api/ps", timeout=OLLAMA_HEALTH_TIMEOUT) or {}
+        for m in ps.get('models', []):
+            mb = int(m.get('size', 0)) // (1024 * 1024)
+            if mb and self.measured.get(m.get('name')) != mb:
+                self.measured[m.get('name')] = mb
+                log_event('ai', 'footprint', model=m.get('name'), mb=mb,
+                          budget=self.budget_mb)
+
+_budget       = MemoryBudget(AI_MEMORY_BUDGET_MB)
+_restart_lock = threading.Lock()
 
 def _restart_ollama():
     """Attempt to restart Ollama service and wait for it to come back."""
-    print("[WATCHDOG] Restarting Ollama service...")
+    if not _restart_lock.acquire(blocking=False):
+        # Another lane (or the watchdog) is already restarting — wait it out
+        with _restart_lock:
+            return _ollama_healthy()
     try:
-        subprocess.run(['sudo', 'systemctl', 'restart', 'ollama'],
-                       timeout=15, capture_output=True)
-    except:
-        try:
-            subprocess.run(['pkill', '-f', 'ollama'],
-                           timeout=5, capture_output=True)
-            time.sleep(2)
-            subprocess.Popen(['ollama', 'serve'],
-                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        except: pass
-    # Wait up to 20s for API to come back
-    for _ in range(20):
+        return _restart_ollama_locked()
+    finally:
+        _restart_lock.release()
+
+def _restart_ollama_locked():
+    log_event('watchdog', 'restart', echo=True, cmd=' '.join(OLLAMA_RESTART_CMD))
+    hw().ollama.restart()
+    # Wait up to OLLAMA_RESTART_WAIT seconds for API to come back
+    for _ in range(OLLAMA_RESTART_WAIT):
         time.sleep(1)
         if _ollama_healthy():
-            print("[WATCHDOG] Ollama recovered")
+            log_event('watchdog', 'recovered', echo=True)
             return True
-    print("[WATCHDOG] Ollama did not recover")
+    log_event('watchdog', 'not_recovered', echo=True)
     return False
 
-def _do_chat(payload):
-    """Execute a chat inference. Returns response string or None."""
+def _do_chat(payload, req=None):
+    """
+    Execute a chat inference. Returns response string or None.
+    Streams when req has an on_event hook: each chunk is reported as a
+    'token' event and the stream is dropped as soon as req is cancelled or
+    past its deadline (req.aborted says which).
+    """
     history = payload.get('history', [])
     text    = payload.get('text', '')
     messages = [{"role": "system", "content": B9_BRAIN}]
     messages += history[-6:]
     messages.append({"role": "user", "content": text})
-    result = _post("/api/chat", {
-        "model": CHAT_MODEL,
+    body = {
+        "model": chat_model(),
         "messages": messages,
         "stream": False,
         "options": CHAT_OPTIONS
-    })
-    if result:
-        resp = result.get("message", {}).get("content", "").strip()
-        return re.sub(r'^(B-9|Robot)\s*[:\-]\s*', '', resp,
-                      flags=re.IGNORECASE).strip() or None
-    return None
-
-def _do_vision(payload):
-    """Execute a vision inference. Returns description string or None."""
-    img_b64 = payload.get('img_b64', '')
-    result  = _post("/api/generate", {
-        "model": VISION_MODEL,
+    }
+    if req is None or req.on_event is None:
+        result = _post("/api/chat", body)
+        if not result:
+            return None
+        resp = result.get("message", {}).get("content", "")
+    else:
+        body["stream"] = True
+        parts, chunks = [], _stream("/api/chat", body)
+        try:
+            for chunk in chunks:
+                if req.cancelled or req.expired():
+                    req.aborted = 'cancelled' if req.cancelled else 'deadline'
+                    return None
+                tok = chunk.get("message", {}).get("content", "")
+                if tok:
+                    parts.append(tok)
+                    req.notify('token', text=tok)
+                if chunk.get("done"):
+                    break
+            else:
+                return None    # stream ended without its final chunk
+        finally:
+            chunks.close()     # closing the connection stops generation
+        resp = ''.join(parts)
+    return re.sub(r'^(B-9|Robot)\s*[:\-]\s*', '', resp.strip(),
+                  flags=re.IGNORECASE).strip() or None
+
+def _do_warm(payload):
+    """Load a model into GPU memory without generating. Returns 'ok' or None."""
+    result = _post("/api/generate", {"model": payload['model']}, timeout=60)
+    return 'ok' if result else None
+
+def _unload(model):
+    """Evict a model from GPU memory now rather than at keep_alive expiry."""
+    _post("/api/generate", {"model": model, "keep_alive": 0},
+          timeout=OLLAMA_HEALTH_TIMEOUT)
+
+def _do_vision(payload, req=None):
+    """
+    Execute a vision inference. Returns description string or None.
+    A raw frame in payload['image'] is encoded here, on the vision lane, so
+    VisionPrep's buffers have a single user; retries reuse the encoding.
+    """
+    trace = VISION_TRACE_ALLOC
+    if trace:
+        if not tracemalloc.is_tracing(): tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    stats = payload.setdefault('stats', {})
+    if hasattr(payload['image'], 'shape'):
+        t0 = time.time()
+        payload['image'], enc = _vision_prep.encode(payload['image'])
+        stats.update(enc, prep_ms=int((time.time() - t0) * 1000))
+    body    = {
+        "model": vision_model(),
         "prompt": "Describe what you see in this image.",
-        "images": [img_b64],
+        "images": [payload['image']],
         "stream": False,
         "options": VIS_OPTIONS
-    })
+    }
+    serial = not _budget.fits_all()
+    if serial:
+        # Never hold both models in GPU memory at once
+        _unload(chat_model())
+        if body["model"] in _budget.measured:
+            body["keep_alive"] = 0
+    t0 = time.time()
+    if payload.get('captured'):
+        stats['capture_ms'] = int((t0 - payload['captured']) * 1000)
+    result  = _post("/api/generate", body)
+    stats['infer_ms'] = int((time.time() - t0) * 1000)
+    if serial and "keep_alive" not in body:
+        _budget.measure()   # first scan: size the model before evicting it
+        if not _budget.fits_all():
+            _unload(body["model"])
+    if trace:
+        # Process-wide: includes whatever the chat lane allocated meanwhile
+        stats['proc_peak_kb'] = (tracemalloc.get_traced_memory()[1] - base) // 1024
+    log_event('vision', 'scan', req.id if req else None, **stats)
     if result:
         raw = result.get('response', '').strip()
         if raw:
@@ -291,140 +1146,553 @@ def _do_vision(payload):
             return f"My optical sensors detect the following. {two}"
     return None
 
-def ai_worker():
+def ai_worker(lane='chat'):
     """
-    Single-threaded AI worker. Processes one request at a time.
-    Implements retry → Ollama restart → degraded mode recovery.
+    Lane AI worker. Processes one request of its lane at a time, admitted
+    against the shared memory budget.
+    Implements retry → Ollama restart → degraded mode recovery per lane.
     """
-    DEGRADED_RESPONSE = (
-        "This unit's cognitive systems are temporarily offline. "
-        "Standing by for recovery."
-    )
+    q = _ai_queues[lane]
     consecutive_failures = 0
 
     while True:
         try:
-            req = _ai_queue.get(timeout=2)
+            _, _, req = q.get(timeout=2)
         except queue.Empty:
             continue
 
         # Drop stale requests (e.g. voice command from 30s ago)
-        age = time.time() - req.ts
-        if age > req.timeout:
-            print(f"[AI] Dropped stale {req.kind} request (age={age:.1f}s)")
-            _ai_queue.task_done()
+        if req.expired():
+            log_event('ai', 'stale_drop', req.id, echo=True, kind=req.kind,
+                      age=round(time.time() - req.ts, 1))
+            req.notify('aborted', reason='deadline')
+            q.task_done()
+            continue
+        if req.cancelled:
+            log_event('ai', 'cancelled', req.id, kind=req.kind)
+            req.notify('aborted', reason='cancelled')
+            q.task_done()
             continue
 
-        result = None
-        for attempt in range(2):   # try once, retry once
-            try:
-                if req.kind == 'chat':
-                    result = _do_chat(req.payload)
-                elif req.kind == 'vision':
-                    result = _do_vision(req.payload)
-                if result:
-                    consecutive_failures = 0
+        model  = req.payload.get('model') or (
+            vision_model() if lane == 'vision' else chat_model())
+        waited = _budget.acquire(lane, _budget.footprint(lane, model))
+        if waited > 0.05:
+            log_event('ai', 'budget_wait', req.id, lane=lane,
+                      ms=int(waited * 1000))
+        deliver = None
+        try:
+            # Warm-ups are best effort: no retry, no failure counting
+            if req.kind == 'warm':
+                t0 = time.time()
+                ok = _do_warm(req.payload)
+                log_event('ai', 'warm', req.id, model=model, ok=bool(ok),
+                          ms=int((time.time() - t0) * 1000))
+                if ok and model not in _budget.measured:
+                    _budget.measure()
+                continue
+
+            if req.cancelled:   # cancelled while waiting for the budget
+                req.aborted = 'cancelled'
+            else:
+                log_event('ai', 'start', req.id, kind=req.kind, lane=lane,
+                          wait_ms=int((time.time() - req.ts) * 1000))
+                req.notify('inferring')
+            t0 = time.time()
+            result = None
+            for attempt in range(2):   # try once, retry once
+                if req.aborted:
                     break
-                # Empty response — Ollama may be degraded
-                print(f"[AI] Empty response (attempt {attempt+1})")
-                if attempt == 0:
-                    time.sleep(2)
-            except Exception as e:
-                print(f"[AI] Worker exception: {e}")
-                if attempt == 0:
-                    time.sleep(2)
-
-        if not result:
-            consecutive_failures += 1
-            print(f"[AI] {consecutive_failures} consecutive failures")
-            if consecutive_failures >= 3:
-                print("[AI] Entering degraded mode - attempting Ollama restart")
-                speak_bg("Warning. Cognitive systems are restarting. Stand by.")
-                if _restart_ollama():
-                    consecutive_failures = 0
-                    result = DEGRADED_RESPONSE
+                try:
+                    if req.kind == 'chat':
+                        result = _do_chat(req.payload, req)
+                    elif req.kind == 'vision':
+                        result = _do_vision(req.payload, req)
+                    if result:
+                        consecutive_failures = 0
+                        break
+                    if req.aborted:
+                        break
+                    # Empty response — Ollama may be degraded
+                    log_event('ai', 'empty', req.id, echo=True,
+                              attempt=attempt+1)
+                    if attempt == 0:
+                        time.sleep(AI_RETRY_DELAY)
+                except Exception as e:
+                    log_event('ai', 'exception', req.id, echo=True,
+                              error=str(e))
+                    if attempt == 0:
+                        time.sleep(AI_RETRY_DELAY)
+
+            if req.cancelled and not req.aborted:
+                req.aborted = 'cancelled'   # finished, but nobody wants it
+            if req.aborted:
+                log_event('ai', 'aborted', req.id, reason=req.aborted,
+                          ms=int((time.time() - t0) * 1000))
+                req.notify('aborted', reason=req.aborted)
+                continue
+
+            if result and model not in _budget.measured:
+                _budget.measure()
+
+            if not result:
+                consecutive_failures += 1
+                log_event('ai', 'failed', req.id, echo=True, lane=lane,
+                          consecutive=consecutive_failures)
+                if consecutive_failures >= 3:
+                    print(f"[AI] {lane} lane degraded - attempting Ollama restart")
+                    speak_bg("Warning. Cognitive systems are restarting. Stand by.")
+                    if _restart_ollama():
+                        consecutive_failures = 0
+                        result = DEGRADED_RESPONSE
+                    else:
+                        result = DEGRADED_RESPONSE
                 else:
-                    result = DEGRADED_RESPONSE
-            else:
-                result = "This unit is experiencing a processing delay. Stand by."
-
-        req.callback(result)
-        _ai_queue.task_done()
+                    result = DELAY_RESPONSE
 
-def submit_chat(text, history, callback, timeout=30):
-    _ai_queue.put(AIRequest('chat', {'text': text, 'history': history},
-                            callback, timeout))
-
-def submit_vision(img_b64, callback, timeout=60):
-    _ai_queue.put(AIRequest('vision', {'img_b64': img_b64},
-                            callback, timeout))
+            log_event('ai', 'done', req.id, kind=req.kind,
+                      ms=int((time.time() - t0) * 1000))
+            deliver = result
+        finally:
+            _budget.release(lane)
+            q.task_done()
+        # Outside the budget: a callback that speaks for a minute must not
+        # hold the other lane's memory slot
+        if deliver is not None:
+            try:
+                req.callback(deliver)
+            except Exception as e:
+                log_event('ai', 'callback_error', req.id, echo=True,
+                          error=str(e))
+
+def start_ai_workers():
+    """One worker thread per lane."""
+    for lane in _ai_queues:
+        threading.Thread(target=ai_worker, args=(lane,), daemon=True,
+                         name=f"AI-{lane.capitalize()}").start()
+
+def _submit(req):
+    depth = _ai_queues[req.lane].qsize()
+    log_event('ai', 'queued', req.id, kind=req.kind, lane=req.lane,
+              depth=depth, priority=req.priority)
+    _inflight[req.id] = req
+    req.notify('queued', lane=req.lane, depth=depth)
+    _ai_queues[req.lane].put((req.priority, next(_ai_order), req))
+    return req
+
+def cancel_request(rid):
+    """Cancel the queued or running AI request with id rid. True if found."""
+    req = _inflight.get(rid)
+    if req is None:
+        return False
+    req.cancelled = True
+    log_event('ai', 'cancel', rid, kind=req.kind)
+    return True
+
+def submit_chat(text, history, callback, timeout=30, rid=None,
+                priority=AI_PRIORITY, on_event=None):
+    return _submit(AIRequest('chat', {'text': text, 'history': history},
+                             callback, timeout, rid, priority=priority,
+                             on_event=on_event))
+
+def submit_vision(image, callback, timeout=60, rid=None,
+                  priority=AI_PRIORITY, on_event=None, captured=None):
+    """image: a BGR frame (encoded on the vision lane) or base64 JPEG."""
+    return _submit(AIRequest('vision', {'image': image, 'captured': captured},
+                             callback, timeout, rid, priority=priority,
+                             on_event=on_event))
+
+_last_warm = {}   # model → time of last warm-up request
+
+def submit_warm(model):
+    """Queue a cheap model load so the next real request finds it resident."""
+    if not model or time.time() - _last_warm.get(model, 0) < WARM_INTERVAL:
+        return None
+    if model == vision_model() and not _budget.fits_all():
+        return None   # loading vision would sit beside the resident chat model
+    _last_warm[model] = time.time()
+    lane = 'vision' if model == vision_model() else 'chat'
+    return _submit(AIRequest('warm', {'model': model}, None, timeout=10,
+                             lane=lane))
 
 # ─── Watchdog ─────────────────────────────────────────────────────────────────
 def _watchdog():
-    """Pings Ollama every 30s. Restarts if unresponsive."""
-    time.sleep(60)   # give system time to fully start before first check
+    """Pings Ollama every WATCHDOG_INTERVAL s. Restarts if unresponsive."""
+    time.sleep(WATCHDOG_DELAY)   # give system time to fully start first
     while True:
-        time.sleep(30)
+        time.sleep(WATCHDOG_INTERVAL)
         if not _ollama_healthy():
-            print("[WATCHDOG] Ollama not responding - restarting")
+            log_event('watchdog', 'unhealthy', echo=True)
             _restart_ollama()
+        else:
+            _resolve_models(force=True)
 
 # ─── Camera Capture ───────────────────────────────────────────────────────────
+_camera_lock = threading.RLock()   # one opener at a time (scan vs prefetch)
+_prefetched  = [None, 0.0]         # [frame, capture time] from prefetch_frame
+
 def capture_frame():
     """Capture one stable frame. Returns numpy array or None."""
-    for idx in range(4):
-        try:
-            c = cv2.VideoCapture(idx)
-            if c.isOpened():
-                for _ in range(3): c.read()   # flush auto-exposure
-                ret, f = c.read()
-                c.release()
-                if ret and f is not None:
-                    return f
-        except: continue
-    return None
+    with _camera_lock:
+        return hw().camera.capture()
 
-def request_vision_scan(callback):
-    """Capture frame and submit vision request to AI queue."""
-    if not CAMERA_AVAILABLE:
-        callback("Warning. Optical sensors offline. No camera detected.")
+def prefetch_frame():
+    """Capture a frame ahead of a likely scan (partial transcript match)."""
+    if not hw().camera.available():
         return
+    t0    = time.time()
     frame = capture_frame()
+    if frame is not None:
+        with _camera_lock:
+            _prefetched[:] = [frame, time.time()]
+        log_event('vision', 'prefetch', ms=int((time.time() - t0) * 1000))
+
+def _take_frame():
+    """
+    (frame, capture time): the prefetched frame if fresh (waiting out an
+    in-flight prefetch), else a new capture.
+    """
+    with _camera_lock:
+        frame, ts = _prefetched
+        _prefetched[:] = [None, 0.0]
+        if frame is not None and time.time() - ts <= PREFETCH_MAX_AGE:
+            return frame, ts
+        return capture_frame(), time.time()
+
+class VisionPrep:
+    """
+    Frame → base64 JPEG with buffers kept across scans: the resize target
+    and the base64 output are preallocated and only replaced when a scan
+    needs more room, the JPEG is read through a memoryview (no copies) and
+    base64-encoded into the output in one chunked pass.
+    The returned view aliases the shared output buffer: it is only valid
+    until the next encode(), which overwrites it in place.
+    """
+    CHUNK = 3 * 16384   # JPEG bytes per base64 step (multiple of 3)
+
+    def __init__(self):
+        self._small = None          # resize target
+        self._b64   = bytearray()   # base64 output
+
+    def encode(self, frame):
+        """
+        Returns (memoryview of the base64 JPEG, stats). stats['est_alloc_kb']
+        is an estimate: the buffers this stage allocated, not OpenCV's own
+        scratch memory.
+        """
+        import cv2
+        alloc = 0
+        h, w  = frame.shape[:2]
+        shape = (int(h * VISION_WIDTH / w), VISION_WIDTH) + frame.shape[2:]
+        if (self._small is None or self._small.shape != shape or
+                self._small.dtype != frame.dtype):
+            import numpy as np
+            self._small = np.empty(shape, frame.dtype)
+            alloc += self._small.nbytes
+        cv2.resize(frame, (shape[1], shape[0]), dst=self._small)
+        _, jpg = cv2.imencode('.jpg', self._small,
+                              [cv2.IMWRITE_JPEG_QUALITY, VISION_QUALITY])
+        alloc += jpg.nbytes
+        src  = memoryview(jpg).cast('B')
+        need = (len(src) + 2) // 3 * 4
+        if len(self._b64) < need:
+            # A new buffer, not a resize: a bytearray with an exported view
+            # cannot be resized
+            self._b64 = bytearray(need + need // 4)
+            alloc += len(self._b64)
+        out, pos, step = self._b64, 0, 0
+        for i in range(0, len(src), self.CHUNK):
+            chunk = binascii.b2a_base64(src[i:i + self.CHUNK], newline=False)
+            out[pos:pos + len(chunk)] = chunk
+            pos += len(chunk)
+            step = max(step, len(chunk))
+        alloc += step   # one base64 step is alive at a time
+        return memoryview(out)[:pos], {
+            'width': shape[1], 'jpeg_kb': len(src) // 1024,
+            'b64_kb': pos // 1024, 'est_alloc_kb': alloc // 1024}
+
+_vision_prep = VisionPrep()   # used by the vision lane worker only
+
+def request_vision_scan(callback, rid=None, timeout=90, priority=AI_PRIORITY,
+                        on_event=None):
+    """Capture frame and submit vision request to AI queue."""
+    if not hw().camera.available():
+        callback(NO_CAMERA_RESPONSE)
+        return
+    frame, captured = _take_frame()
     if frame is None:
-        callback("Optical sensor malfunction. Camera not responding.")
+        callback(CAMERA_FAULT_RESPONSE)
         return
-    h, w = frame.shape[:2]
-    small = cv2.resize(frame, (320, int(h * 320 / w)))
-    _, buf = cv2.imencode('.jpg', small, [cv2.IMWRITE_JPEG_QUALITY, 80])
-    import base64
-    img_b64 = base64.b64encode(buf.tobytes()).decode()
-    sz = len(buf.tobytes()) // 1024
-    print(f"[VISION] Frame 320px ({sz}KB) → queue")
-    submit_vision(img_b64, callback, timeout=90)
+    submit_vision(frame, callback, timeout=timeout, rid=rid,
+                  priority=priority, on_event=on_event, captured=captured)
+
+# ─── Memory Store (SQLite FTS5) ────────────────────────────────────────────────
+#
+# Exchanges survive restarts (and the daily 4AM refresh) in an FTS5 table.
+# Writes go through a queue to a background thread, never the request path.
+# Each chat recalls the few exchanges most relevant to the new question.
+#
+class MemoryStore:
+    _STOP = {"the", "and", "you", "your", "are", "was", "what", "who", "how",
+             "why", "when", "where", "which", "this", "that", "does", "did",
+             "for", "with", "about", "tell", "can", "there", "have", "has",
+             "robot", "unit"}
+
+    def __init__(self, path=MEMORY_DB):
+        self.path    = path
+        self.enabled = False
+        self.last_ms = 0.0           # latency of the most recent recall
+        self._q      = queue.Queue()
+        self._lock   = threading.Lock()
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self._db = self._connect()
+            self._db.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS exchanges "
+                "USING fts5(user, assistant, ts UNINDEXED)")
+            self._db.commit()
+            n = self._db.execute("SELECT count(*) FROM exchanges").fetchone()[0]
+        except Exception as e:
+            print(f"[MEMORY] Disabled: {e}")
+            return
+        self.enabled = True
+        print(f"[MEMORY] {path} ({n} exchanges)")
+        threading.Thread(target=self._writer, daemon=True,
+                         name="Memory-Writer").start()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def remember(self, user, assistant):
+        """Queue one exchange for the writer thread. Never blocks."""
+        if self.enabled and user and assistant:
+            self._q.put(('add', user, assistant, time.time()))
+
+    def clear(self):
+        if self.enabled:
+            self._q.put(('clear',))
+
+    def recall(self, text, k=MEMORY_RECALL):
+        """Returns up to k (user, assistant) pairs most relevant to text."""
+        if not self.enabled:
+            return []
+        words = [w for w in re.findall(r'[a-z0-9]+', text.lower())
+                 if len(w) > 2 and w not in self._STOP]
+        if not words:
+            return []
+        words = list(dict.fromkeys(words))
+        match = ' OR '.join(f'"{w}"' for w in words)
+        t0 = time.perf_counter()
+        try:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT user, assistant FROM exchanges "
+                    "WHERE exchanges MATCH ? ORDER BY rank LIMIT ?",
+                    (match, k * 4)).fetchall()
+        except Exception as e:
+            print(f"[MEMORY] Recall error: {e}")
+            return []
+        # A single shared common word is not relevance
+        need = min(MEMORY_MIN_MATCH, len(words))
+        rows = [r for r in rows if len(set(words) & set(
+                    re.findall(r'[a-z0-9]+', (r[0] + ' ' + r[1]).lower()))) >= need][:k]
+        self.last_ms = (time.perf_counter() - t0) * 1000
+        if self.last_ms > 5:
+            print(f"[MEMORY] Slow recall: {self.last_ms:.1f}ms")
+        return rows
+
+    def _writer(self):
+        db = self._connect()
+        added = 0
+        while True:
+            op = self._q.get()
+            try:
+                if op[0] == 'add':
+                    db.execute("INSERT INTO exchanges (user, assistant, ts) "
+                               "VALUES (?, ?, ?)", op[1:])
+                    added += 1
+                    if added % 100 == 0:
+                        db.execute(
+                            "DELETE FROM exchanges WHERE rowid <= "
+                            "(SELECT max(rowid) FROM exchanges) - ?",
+                            (MEMORY_MAX,))
+                elif op[0] == 'clear':
+                    db.execute("DELETE FROM exchanges")
+                db.commit()
+            except Exception as e:
+                print(f"[MEMORY] Write error: {e}")
 
 # ─── B9 Brain ─────────────────────────────────────────────────────────────────
-class B9Brain:
-    def __init__(self):
-        self.history = []   # [{"role": ..., "content": ...}]
+def _is_scan(cmd_lower):
+    return any(x in cmd_lower for x in SCAN_PHRASES)
+
+def _clip(text, limit=MEMORY_TURN_CHARS):
+    """text cut at a word boundary to at most limit chars."""
+    if len(text) <= limit:
+        return text
+    return text[:limit - 1].rsplit(' ', 1)[0] + '…'
 
-    def process(self, user_input, from_voice=False):
+def _normalize(text):
+    return ' '.join(text.lower().split())
+
+class B9Brain:
+    def __init__(self, memory=None):
+        self.history = []       # [{"role": ..., "content": ...}]
+        self.memory  = memory   # MemoryStore, or None for RAM-only history
+        self._spec   = None     # in-flight speculative chat for a voice partial
+        self._spec_lock = threading.Lock()
+
+    def speculate(self, text):
+        """
+        Dispatch a chat for a stable partial transcript before the final one
+        arrives. process() reuses the result if the final text matches.
+        """
+        key = _normalize(text)
+        if len(key.split()) < 2 or key in BUILTIN_COMMANDS or _is_scan(key):
+            return
+        with self._spec_lock:
+            if self._spec and self._spec['key'] == key:
+                return
+            self._cancel_spec()
+            spec = {'key': key, 'result': [None], 'aborted': [None],
+                    'done': threading.Event()}
+            def _cb(r):
+                spec['result'][0] = r
+                spec['done'].set()
+            def _on_event(event, **fields):
+                if event == 'aborted':
+                    spec['aborted'][0] = fields.get('reason')
+                    spec['done'].set()
+            spec['req'] = submit_chat(text, self._context(text), _cb, timeout=30,
+                                      on_event=_on_event)
+            self._spec = spec
+        log_event('brain', 'speculate', spec['req'].id, text=key)
+
+    def cancel_speculation(self):
+        with self._spec_lock:
+            self._cancel_spec()
+
+    def _cancel_spec(self):
+        if self._spec:
+            self._spec['req'].cancelled = True
+            log_event('brain', 'spec_cancel', self._spec['req'].id)
+            self._spec = None
+
+    def _take_speculation(self, cmd):
+        """The in-flight speculation if it was for cmd; any other is cancelled."""
+        with self._spec_lock:
+            spec, key = self._spec, _normalize(cmd)
+            if spec and spec['key'] == key:
+                self._spec = None
+                log_event('brain', 'spec_hit', spec['req'].id)
+                return spec
+            self._cancel_spec()
+            return None
+
+    def _context(self, text):
+        """
+        Prompt history within MEMORY_CONTEXT_CHARS: recalled exchanges
+        relevant to text (best first), then the last exchange if it fits.
+        """
+        recent = self.history[-2:]
+        pairs  = [(u, a) for u, a in
+                  (self.memory.recall(text) if self.memory else [])
+                  if [u, a] != [m['content'] for m in recent]]
+        if len(recent) == 2:
+            pairs.append((recent[0]['content'], recent[1]['content']))
+        context, used = [], 0
+        for u, a in pairs:
+            u, a = _clip(u), _clip(a)
+            if used + len(u) + len(a) > MEMORY_CONTEXT_CHARS:
+                continue
+            used += len(u) + len(a)
+            context += [{"role": "user", "content": u},
+                        {"role": "assistant", "content": a}]
+        return context
+
+    def _remember(self, cmd, resp):
+        self.history.append({"role": "user", "content": cmd})
+        self.history.append({"role": "assistant", "content": resp})
+        if len(self.history) > 20: self.history = self.history[-20:]
+        if self.memory and resp not in (DELAY_RESPONSE, DEGRADED_RESPONSE,
+                                        NO_CAMERA_RESPONSE,
+                                        CAMERA_FAULT_RESPONSE):
+            self.memory.remember(cmd, resp)
+
+    def _say(self, text, on_event=None, rid=None):
+        if on_event: on_event('speaking', text=text)
+        speak(text, rid)
+
+    def process(self, user_input, from_voice=False, rid=None,
+                priority=AI_PRIORITY, timeout=None, on_event=None,
+                speak_reply=False):
+        """
+        Answer one command. Voice input (or speak_reply) is also spoken.
+        timeout is the AI deadline in seconds (default 30 chat / 90 scan).
+        With an on_event hook, fn(event, **fields) gets the request's
+        progress and a scan waits for its description instead of returning
+        "Scanning." at once.
+        """
         cmd       = user_input.strip()
         cmd_lower = cmd.lower()
+        say       = from_voice or speak_reply
+        # Claim (or cancel) any speculation dispatched from voice partials
+        spec = self._take_speculation(cmd) if from_voice else None
+
+        # The worker reports 'aborted' (cancel/deadline) without a callback
+        resp_holder = [None]
+        aborted     = [None]
+        done_event  = threading.Event()
+        def _on_event(event, **fields):
+            if on_event: on_event(event, **fields)   # before waking process()
+            if event == 'aborted':
+                aborted[0] = fields.get('reason')
+                _speech.release(rid)
+                done_event.set()
+        def _await(ai_rid, timeout):
+            """
+            Wait for the answer. With a hook the deadline is kept from
+            submission, not from when the lane dequeues the request.
+            """
+            if on_event is None:
+                return done_event.wait(timeout=timeout + 5)
+            if done_event.wait(timeout=timeout) or resp_holder[0]:
+                return True
+            cancel_request(ai_rid)
+            _on_event('aborted', reason='deadline')
+            return False
 
         # ── Instant built-in commands (no AI needed) ──
         if cmd_lower == 'ping':
             return "PONG"
 
-        if any(x in cmd_lower for x in [
-                'what do you see', 'what can you see', 'look around',
-                'scan', 'optical scan', 'what is in front',
-                'describe surroundings', 'camera', 'take a look']):
-            speak("Scanning.")
+        if cmd_lower in STOP_COMMANDS:
+            _speech.barge_in('voice' if from_voice else 'command')
+            return "Standing by."
+
+        if _is_scan(cmd_lower):
+            # Voice and legacy TCP scans are always spoken; v2 asks only
+            # with speak_reply
+            scan_say = say or on_event is None
+            if scan_say: speak("Scanning.", rid)
             def _vis_done(desc):
-                speak(desc)
-                self.history.append({"role": "assistant", "content": desc})
-            request_vision_scan(_vis_done)
-            return "Scanning."
+                _speech.release(rid)
+                resp_holder[0] = desc
+                if scan_say: self._say(desc, on_event, rid)
+                self._remember(cmd, desc)
+                done_event.set()
+            timeout = 90 if timeout is None else timeout
+            if from_voice:
+                _speech.hold(rid)   # a barge-in during the scan cancels it
+            request_vision_scan(_vis_done, rid, timeout, priority, _on_event)
+            if on_event is None:
+                return "Scanning."
+            if _await(rid, timeout) and not aborted[0]:
+                done_event.wait()   # description arrived: let it be spoken
+            return resp_holder[0] or DELAY_RESPONSE
 
         if cmd_lower in ['status', 'systems', 'report']:
             try:
@@ -437,15 +1705,16 @@ class B9Brain:
                     ['uptime', '-p'], timeout=3).decode().strip()
             except: up = "unknown"
             resp = (f"B-9 systems report. Temperature {temp} degrees Celsius. "
-                    f"Uptime {up}. AI queue depth: {_ai_queue.qsize()}. "
+                    f"Uptime {up}. AI queue depth: {ai_queue_depth()}. "
                     "All primary systems nominal.")
-            if from_voice: speak(resp)
+            if say: self._say(resp, on_event, rid)
             return resp
 
         if cmd_lower == 'clear':
             self.history = []
+            if self.memory: self.memory.clear()
             resp = "Affirmative. Memory banks purged."
-            if from_voice: speak(resp)
+            if say: self._say(resp, on_event, rid)
             return resp
 
         if cmd_lower in ['hello', 'hi', 'hey', 'greetings']:
@@ -454,52 +1723,65 @@ class B9Brain:
                 "Robot B-9 reporting. All systems within normal parameters.",
                 "Greetings. This unit is ready. What do you require?",
             ])
-            if from_voice: speak(resp)
+            if say: self._say(resp, on_event, rid)
             return resp
 
         if cmd_lower == 'help':
             resp = (f"B-9 command interface. Say: hello, status, clear, "
                     f"what do you see, or ask any question. "
                     f"Wake words: {', '.join(WAKE_WORDS)}.")
-            if from_voice: speak(resp)
+            if say: self._say(resp, on_event, rid)
             return resp
 
-        # ── AI response via queue ──
-        resp_holder = [None]
-        done_event  = threading.Event()
-
-        def _on_result(text):
-            resp_holder[0] = text
-            done_event.set()
+        # ── AI response via queue (or a matching voice speculation) ──
+        timeout = 30 if timeout is None else timeout
+        ai_rid = rid
+        if spec:
+            resp_holder, done_event = spec['result'], spec['done']
+            aborted, ai_rid = spec['aborted'], spec['req'].id
+        else:
+            def _on_result(text):
+                resp_holder[0] = text
+                done_event.set()
 
-        self.history.append({"role": "user", "content": cmd})
-        submit_chat(cmd, list(self.history), _on_result, timeout=30)
+            submit_chat(cmd, self._context(cmd), _on_result, timeout=timeout,
+                        rid=rid, priority=priority, on_event=_on_event)
 
         if from_voice:
-            # Voice: block and speak when done
-            globals()['_b9_speaking'] = True  # block mic during thinking
-            done_event.wait(timeout=35)
-            globals()['_b9_speaking'] = False
+            # Voice: block and speak when done; a barge-in meanwhile cancels
+            _speech.hold(ai_rid)
+            try:
+                done_event.wait(timeout=timeout + 5)
+            finally:
+                _speech.release(ai_rid)
+            if aborted[0] == 'cancelled':
+                return "Standing by."
             resp = resp_holder[0] or "Processing delay. Stand by."
-            self.history.append({"role": "assistant", "content": resp})
-            if len(self.history) > 20: self.history = self.history[-20:]
-            speak(resp)
+            if resp_holder[0]: self._remember(cmd, resp)
+            self._say(resp, on_event, rid)
             return resp
         else:
             # TCP: block and return
-            done_event.wait(timeout=35)
+            if not _await(ai_rid, timeout):
+                return DELAY_RESPONSE   # the deadline error already went out
             resp = resp_holder[0] or "Processing delay. Stand by."
-            self.history.append({"role": "assistant", "content": resp})
-            if len(self.history) > 20: self.history = self.history[-20:]
+            if resp_holder[0]: self._remember(cmd, resp)
+            if say: self._say(resp, on_event, rid)
             return resp
 
 # ─── Voice Listener (Vosk offline) ────────────────────────────────────────────
+def _rms(pcm):
+    """RMS level of a 16-bit mono PCM chunk."""
+    samples = array.array('h', pcm)
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(x * x for x in samples) / len(samples))
+
 class VoiceListener:
     def __init__(self, brain):
         self.brain     = brain
         self.running   = False
         self.vosk_model = None
-        self.mic_card  = _MIC_CARD if _MIC_CARD is not None else 1
         self._load_model()
 
     def _load_model(self):
@@ -539,177 +1821,439 @@ class VoiceListener:
             print("[VOICE] Disabled - no model")
             return
         try:
-            import pyaudio as _pa
-            p = _pa.PyAudio()
-            has_mic = any(p.get_device_info_by_index(i)['maxInputChannels'] > 0
-                          for i in range(p.get_device_count()))
-            p.terminate()
-            if not has_mic:
+            if not hw().mic.has_input():
                 print("[VOICE] No microphone found")
                 return
         except Exception as e:
             print(f"[VOICE] PyAudio error: {e}")
             return
         self.running = True
-        threading.Thread(target=self._wake_loop, daemon=True).start()
+        threading.Thread(target=self._wake_loop, daemon=True,
+                         name="Voice-Wake").start()
         print(f"[VOICE] Listening for: {WAKE_WORDS}")
 
-    def _open_stream(self):
-        import pyaudio as _pa
-        p = _pa.PyAudio()
-        target = None
-        for i in range(p.get_device_count()):
-            info = p.get_device_info_by_index(i)
-            if (info['maxInputChannels'] > 0 and
-                    (str(self.mic_card) in info['name'] or
-                     'webcam' in info['name'].lower() or
-                     'usb' in info['name'].lower())):
-                target = i; break
-        if target is None:
-            for i in range(p.get_device_count()):
-                if p.get_device_info_by_index(i)['maxInputChannels'] > 0:
-                    target = i; break
-        stream = p.open(format=_pa.paInt16, channels=1, rate=16000,
-                        input=True, input_device_index=target,
-                        frames_per_buffer=4096)
-        return p, stream
-
     def _wake_loop(self):
         import vosk as _v
         rec = _v.KaldiRecognizer(self.vosk_model, 16000)
         rec.SetWords(False)
         print("[VOICE] Wake word detection running...")
-        p = None
+        stream = None
+        echo   = 0.0                            # decaying echo peak (RMS)
+        calib  = 0                              # calibration chunks left
+        loud   = collections.deque(maxlen=4)    # last ~1s: above echo?
+        was_playing = False
         while self.running:
             try:
-                p, stream = self._open_stream()
+                stream = hw().mic.open()
                 while self.running:
-                    data = stream.read(4096, exception_on_overflow=False)
-                    if _b9_speaking:
+                    data = stream.read(4096)
+                    # While B-9 talks the mic hears it too: only chunks well
+                    # above the echo level can carry a barge-in wake word
+                    playing = _speech.playing()
+                    if playing and not was_playing:
+                        echo, calib = 0.0, BARGE_IN_CALIBRATE   # new utterance
+                    elif was_playing and not playing:
+                        # Drop audio heard during playback so a trailing echo
+                        # "B9" decoded after it ends cannot wake us
                         rec = _v.KaldiRecognizer(self.vosk_model, 16000)
-                        continue
+                        loud.clear()
+                    was_playing = playing
+                    if playing:
+                        rms = _rms(data)
+                        if calib:
+                            calib -= 1
+                            hot = False
+                        else:
+                            hot = rms > max(BARGE_IN_RMS, BARGE_IN_ECHO * echo)
+                        # Every chunk teaches the echo level, loud ones too,
+                        # so echo above BARGE_IN_RMS still raises the bar
+                        echo = max(rms, echo * BARGE_IN_DECAY)
+                        loud.append(hot)
+                    else:
+                        loud.clear()
                     if rec.AcceptWaveform(data):
                         text = json.loads(rec.Result()).get('text', '').lower()
                     else:
                         text = json.loads(rec.PartialResult()).get('partial', '').lower()
                     if text and any(w in text for w in WAKE_WORDS):
-                        if _b9_speaking:
+                        if playing and not any(loud):
+                            log_event('voice', 'echo_ignored', text=text,
+                                      echo=int(echo))
                             rec = _v.KaldiRecognizer(self.vosk_model, 16000)
                             continue
-                        print(f"[WAKE] '{text}'")
-                        stream.stop_stream(); stream.close(); p.terminate(); p = None
-                        speak("B9.")
+                        barged = _speech.busy() and _speech.barge_in('wake')
+                        log_event('voice', 'wake', text=text, barge_in=barged)
+                        submit_warm(chat_model())
+                        stream.close(); stream = None
+                        if not barged:
+                            speak("B9.")
                         self._listen_command()
                         rec = _v.KaldiRecognizer(self.vosk_model, 16000)
-                        p, stream = self._open_stream()
+                        stream = hw().mic.open()
             except OSError as e:
                 # USB device not ready yet - wait and retry
                 print(f"[VOICE] Stream error (USB not ready?): {e} - retrying in 3s")
-                if p:
-                    try: p.terminate()
+                if stream:
+                    try: stream.close()
                     except: pass
-                    p = None
+                    stream = None
                 time.sleep(3)
                 # Re-detect audio card in case it changed
-                spk, mic = _find_audio_cards()
-                if mic is not None:
-                    self.mic_card = mic
+                hw().mic.redetect()
                 rec = _v.KaldiRecognizer(self.vosk_model, 16000)
             except Exception as e:
                 print(f"[VOICE] Wake loop error: {e}")
                 time.sleep(2)
-                if p:
-                    try: p.terminate()
+                if stream:
+                    try: stream.close()
                     except: pass
-                    p = None
+                    stream = None
 
     def _listen_command(self):
         import vosk as _v
         # Wait for "B9." to finish before opening mic
         waited = 0
-        while _b9_speaking and waited < 3:
+        while _speech.playing() and waited < 3:
             time.sleep(0.05); waited += 0.05
-        print("[VOICE] Listening for command...")
+        log_event('voice', 'listen')
         rec = _v.KaldiRecognizer(self.vosk_model, 16000)
         silence = 0
         got_speech = False
+        last_partial, stable, scan_started = '', 0, False
+        dispatched = False
         try:
-            p, stream = self._open_stream()
+            stream = hw().mic.open()
             while True:
-                data = stream.read(4096, exception_on_overflow=False)
+                data = stream.read(4096)
                 if rec.AcceptWaveform(data):
                     text = json.loads(rec.Result()).get('text', '').strip()
                     if text:
-                        print(f"[CMD] '{text}'")
+                        rid = new_request_id()
+                        log_event('voice', 'command', rid, text=text)
                         threading.Thread(
-                            target=self.brain.process,
-                            args=(text,), kwargs={'from_voice': True},
-                            daemon=True).start()
+                            target=self.brain.process, args=(text,),
+                            kwargs={'from_voice': True, 'rid': rid},
+                            daemon=True, name=f"Brain-{rid}").start()
+                        dispatched = True
                         break
                     silence += 1
                 else:
                     partial = json.loads(rec.PartialResult()).get('partial', '')
                     if partial: silence = 0; got_speech = True
                     elif got_speech: silence += 1
+                    # Speculate on partials: start the camera for a scan
+                    # intent; dispatch chat once the partial stops changing
+                    if partial and partial != last_partial:
+                        log_event('voice', 'partial', text=partial)
+                        last_partial, stable = partial, 0
+                        if not scan_started and _is_scan(partial.lower()):
+                            scan_started = True
+                            submit_warm(vision_model())
+                            threading.Thread(target=prefetch_frame, daemon=True,
+                                             name="Vision-Prefetch").start()
+                    elif partial:
+                        stable += 1
+                        if stable == SPECULATE_STABLE:
+                            self.brain.speculate(partial)
                     if silence > 16:   # ~4s of silence
                         final = json.loads(rec.FinalResult()).get('text', '').strip()
                         if final:
-                            print(f"[CMD] '{final}'")
+                            rid = new_request_id()
+                            log_event('voice', 'command', rid, text=final)
                             threading.Thread(
-                                target=self.brain.process,
-                                args=(final,), kwargs={'from_voice': True},
-                                daemon=True).start()
+                                target=self.brain.process, args=(final,),
+                                kwargs={'from_voice': True, 'rid': rid},
+                                daemon=True, name=f"Brain-{rid}").start()
+                            dispatched = True
                         break
-            stream.stop_stream(); stream.close(); p.terminate()
+            stream.close()
         except Exception as e:
-            print(f"[CMD] Error: {e}")
+            log_event('voice', 'listen_error', echo=True, error=str(e))
+        if not dispatched:
+            self.brain.cancel_speculation()
 
     def trigger_ptt(self):
-        threading.Thread(target=self._listen_command, daemon=True).start()
+        if _speech.busy():
+            _speech.barge_in('ptt')
+        submit_warm(chat_model())
+        threading.Thread(target=self._listen_command, daemon=True,
+                         name="Voice-PTT").start()
 
     def trigger_camera(self):
         speak("Scanning.")
         def _cb(desc): speak(desc)
         threading.Thread(
-            target=request_vision_scan, args=(_cb,), daemon=True).start()
+            target=request_vision_scan, args=(_cb,), daemon=True,
+            name="Vision-Scan").start()
 
 # ─── Keypad ───────────────────────────────────────────────────────────────────
+KEY_PTT    = {79, 2}   # keypad 1 / main-row 1
+KEY_CAMERA = {80, 3}   # keypad 2 / main-row 2
+
 class KeypadHandler:
     def __init__(self, voice):
         self.voice = voice
 
     def start(self):
-        devs = glob.glob('/dev/input/event*')
-        if not devs:
-            print("[KEYPAD] No input devices (keypad not connected)")
-            return
-        for dev in devs:
-            threading.Thread(target=self._watch, args=(dev,), daemon=True).start()
-        print(f"[KEYPAD] Watching {len(devs)} device(s)")
+        hw().keypad.start(self._on_key)
 
-    def _watch(self, dev):
+    def _on_key(self, code, dev):
+        if code in KEY_PTT:
+            log_event('keypad', 'ptt', dev=dev)
+            self.voice.trigger_ptt()
+        elif code in KEY_CAMERA:
+            log_event('keypad', 'camera', dev=dev)
+            self.voice.trigger_camera()
+
+# ─── Profiler / Thread Inspector ───────────────────────────────────────────────
+#
+# In-process replacements for py-spy, driven over TCP ('profile', 'threads').
+# Samples come from sys._current_frames(); per-thread CPU time and kernel
+# state come from /proc/self/task/<tid>/stat.
+#
+_profile_lock = threading.Lock()
+
+def _task_stats():
+    """{native tid: (kernel state, cpu seconds)} for every thread."""
+    hz  = os.sysconf('SC_CLK_TCK')
+    out = {}
+    for path in glob.glob('/proc/self/task/*/stat'):
         try:
-            with open(dev, 'rb') as f:
-                while True:
-                    raw = f.read(24)
-                    if len(raw) < 24: continue
-                    _, _, ev_type, ev_code, ev_value = struct.unpack('llHHI', raw)
-                    if ev_type == 1 and ev_value == 1:
-                        if ev_code in {79, 2}:
-                            print("[KEYPAD] PTT")
-                            self.voice.trigger_ptt()
-                        elif ev_code in {80, 3}:
-                            print("[KEYPAD] Camera")
-                            self.voice.trigger_camera()
-        except: pass
+            raw  = open(path).read()
+            rest = raw[raw.rindex(')') + 2:].split()   # fields 3.. after comm
+            out[int(path.split('/')[4])] = (
+                rest[0], (int(rest[11]) + int(rest[12])) / hz)
+        except: continue
+    return out
+
+def _frame_name(f):
+    return f"{os.path.basename(f.f_code.co_filename)}:{f.f_code.co_name}"
+
+def _frame_where(f):
+    line = linecache.getline(f.f_code.co_filename, f.f_lineno).strip()
+    return f"{_frame_name(f)}:{f.f_lineno} {line}"
+
+def profile(seconds, hz=PROFILE_HZ):
+    """
+    Sample every other thread's stack for `seconds`.
+    Returns (Counter of collapsed stacks, {thread: cpu seconds}, samples).
+    Collapsed stacks are 'Thread;outer;...;inner' as used by flamegraph.pl.
+    """
+    me       = threading.get_ident()
+    stacks   = collections.Counter()
+    names    = {}
+    cpu0     = _task_stats()
+    samples  = 0
+    end      = time.time() + seconds
+    refresh  = 0
+    while time.time() < end:
+        if time.time() >= refresh:   # thread names change rarely
+            names   = {t.ident: t.name for t in threading.enumerate()}
+            refresh = time.time() + 1
+        for ident, f in sys._current_frames().items():
+            if ident == me:
+                continue
+            frames = []
+            while f is not None:
+                frames.append(_frame_name(f))
+                f = f.f_back
+            frames.append(names.get(ident, f"thread-{ident}"))
+            stacks[';'.join(reversed(frames))] += 1
+        samples += 1
+        time.sleep(1.0 / hz)
+    tids = {t.native_id: t.name for t in threading.enumerate()}
+    cpu  = {tids.get(tid, f"tid-{tid}"): round(c - cpu0.get(tid, ('', 0.0))[1], 3)
+            for tid, (_, c) in _task_stats().items()}
+    return stacks, cpu, samples
+
+def thread_inventory():
+    """One dict per live thread: ids, kernel state, CPU and where it waits."""
+    frames = sys._current_frames()
+    stats  = _task_stats()
+    out    = []
+    for t in threading.enumerate():
+        f = frames.get(t.ident)
+        state, cpu = stats.get(t.native_id, ('?', 0.0))
+        info = {"name": t.name, "tid": t.native_id, "daemon": t.daemon,
+                "state": state, "cpu_s": round(cpu, 2)}
+        if f is not None:
+            # Innermost frame is usually stdlib (queue/threading/socket);
+            # the innermost frame in this file says what B-9 is waiting for.
+            info["at"] = _frame_where(f)
+            own = f
+            while own is not None and own.f_code.co_filename != __file__:
+                own = own.f_back
+            if own is not None and own is not f:
+                info["caller"] = _frame_where(own)
+        out.append(info)
+    return out
 
 # ─── TCP Server ───────────────────────────────────────────────────────────────
+#
+# Port 5000 speaks two protocols. Legacy: one text line in, one reply line
+# out, in order. v2: a client opens with {"op": "hello", "v": 2} and then
+# exchanges JSON-lines frames; every ask carries a client id and replies are
+# sent as soon as each is ready, so they may arrive out of order.
+#
+#   → {"op": "ask", "id": "a1", "text": "...", "priority": 0-9,
+#      "deadline": seconds, "stream": true, "speak": false}
+#   → {"op": "cancel", "id": "a1"}
+#   ← {"id": "a1", "event": "queued", "rid": 17, "lane": "chat", "depth": 0}
+#   ← {"id": "a1", "event": "inferring"}
+#   ← {"id": "a1", "event": "token", "text": "Affirm"}        (stream only)
+#   ← {"id": "a1", "event": "speaking", "text": "..."}
+#   ← {"id": "a1", "event": "done", "text": "...", "ms": 1830}
+#   ← {"id": "a1", "event": "cancelled"} | {"id": "a1", "event": "error", ...}
+#
+# Every id ends with exactly one done, cancelled or error frame.
+#
+def _hello_frame(line):
+    """The hello frame if line is one, else None."""
+    if not line.startswith('{'):
+        return None
+    try:
+        frame = json.loads(line)
+    except ValueError:
+        return None
+    if isinstance(frame, dict) and frame.get('op') == 'hello':
+        return frame
+    return None
+
+class _V2Session:
+    """One v2 connection. Each ask runs on its own thread."""
+    def __init__(self, brain, conn, addr):
+        self.brain, self.conn, self.addr = brain, conn, addr
+        self.jobs  = {}                  # client id → job dict
+        self._lock = threading.RLock()   # guards jobs and socket writes
+
+    def run(self, lines):
+        try:
+            for line in lines:
+                try:
+                    frame = json.loads(line)
+                    if not isinstance(frame, dict): raise ValueError
+                except ValueError:
+                    self._send({"event": "error", "error": "bad frame"})
+                    continue
+                op = frame.get('op')
+                if op == 'ask':
+                    self._ask(frame)
+                elif op == 'cancel':
+                    self._cancel(frame.get('id'))
+                else:
+                    self._send({"id": frame.get('id'), "event": "error",
+                                "error": f"unknown op: {op}"})
+        finally:
+            # Client gone — nobody is waiting for what is still in flight
+            for jid in list(self.jobs):
+                self._cancel(jid, quiet=True)
+
+    def _send(self, frame):
+        data = (json.dumps(frame, default=str) + '\n').encode('utf-8')
+        with self._lock:
+            try: self.conn.sendall(data)
+            except OSError: pass
+
+    def _ask(self, frame):
+        jid  = frame.get('id')
+        text = str(frame.get('text') or '').strip()
+        try:
+            priority = min(9, max(0, int(frame.get('priority', AI_PRIORITY))))
+            deadline = frame.get('deadline')
+            deadline = float(deadline) if deadline is not None else None
+        except (TypeError, ValueError):
+            self._send({"id": jid, "event": "error",
+                        "error": "bad priority or deadline"})
+            return
+        job = {'id': jid, 'rid': new_request_id(), 'finished': False,
+               'cancelled': False, 'stream': bool(frame.get('stream')),
+               't0': time.time()}
+        with self._lock:
+            if jid is None or not text:
+                err = "ask needs an id and text"
+            elif jid in self.jobs:
+                err = "duplicate id"
+            elif len(self.jobs) >= TCP_V2_INFLIGHT:
+                err = "too many requests in flight"
+            else:
+                err = None
+                self.jobs[jid] = job
+        if err:
+            self._send({"id": jid, "event": "error", "error": err})
+            return
+        threading.Thread(
+            target=self._run_ask,
+            args=(job, text, priority, deadline, bool(frame.get('speak'))),
+            daemon=True, name=f"TCPv2-{job['rid']}").start()
+
+    def _run_ask(self, job, text, priority, deadline, speak_reply):
+        rid = job['rid']
+        log_event('tcp', 'recv', rid, addr=self.addr[0], v=2, id=job['id'],
+                  text=text, priority=priority)
+        try:
+            resp = self.brain.process(
+                text, rid=rid, priority=priority, timeout=deadline,
+                on_event=lambda event, **f: self._on_event(job, event, **f),
+                speak_reply=speak_reply)
+        except Exception as e:
+            log_event('tcp', 'error', rid, echo=True, error=str(e))
+            self._finish(job, {"event": "error", "error": "internal error"})
+            return
+        ms = int((time.time() - job['t0']) * 1000)
+        log_event('tcp', 'reply', rid, ms=ms, v=2)
+        self._finish(job, {"event": "done", "text": resp, "ms": ms})
+
+    def _on_event(self, job, event, **fields):
+        if event == 'queued':
+            fields['rid'] = job['rid']
+            if job['cancelled']:
+                cancel_request(job['rid'])   # cancel raced the submit
+        elif event == 'aborted':
+            if fields.get('reason') == 'deadline':
+                self._finish(job, {"event": "error",
+                                   "error": "deadline exceeded"})
+            return
+        elif event == 'token' and not job['stream']:
+            return
+        with self._lock:
+            if not job['finished']:
+                self._send({"id": job['id'], "event": event, **fields})
+
+    def _finish(self, job, frame):
+        """Send job's final frame once; later events for it are dropped."""
+        with self._lock:
+            if job['finished']:
+                return
+            job['finished'] = True
+            if self.jobs.get(job['id']) is job:
+                del self.jobs[job['id']]
+            self._send({"id": job['id'], **frame})
+
+    def _cancel(self, jid, quiet=False):
+        with self._lock:
+            job = self.jobs.get(jid)
+        if job is None:
+            if not quiet:
+                self._send({"id": jid, "event": "error", "error": "unknown id"})
+            return
+        job['cancelled'] = True
+        _speech.cancel(job['rid'])   # queued, inferring or speaking
+        log_event('tcp', 'cancel', job['rid'], id=jid)
+        self._finish(job, {"event": "cancelled"})
+
+# Diagnostic verbs: only the verb followed by numeric or key=value arguments,
+# so questions like "dump the trash?" still reach the brain
+_DIAGNOSTIC = re.compile(
+    r'^(dump|profile|threads)((?:\s+(?:[-+]?\d+(?:\.\d+)?|\w+=\S+))*)\s*$',
+    re.IGNORECASE)
+
 class TCPServer:
     def __init__(self, brain):
         self.brain = brain
 
     def start(self, port=5000):
-        threading.Thread(target=self._listen, args=(port,), daemon=True).start()
+        threading.Thread(target=self._listen, args=(port,), daemon=True,
+                         name="TCP-Listen").start()
         print(f"[TCP] Listening on port {port}")
 
     def _listen(self, port):
@@ -722,32 +2266,114 @@ class TCPServer:
                 while True:
                     conn, addr = srv.accept()
                     threading.Thread(
-                        target=self._handle, args=(conn, addr), daemon=True).start()
+                        target=self._handle, args=(conn, addr), daemon=True,
+                        name=f"TCP-{addr[0]}:{addr[1]}").start()
             except Exception as e:
                 print(f"[TCP] Error: {e}"); time.sleep(3)
 
     def _handle(self, conn, addr):
-        print(f"[TCP] {addr[0]} connected")
+        log_event('tcp', 'connect', addr=addr[0])
         try:
             conn.settimeout(300)
-            buf = b''
-            while True:
-                chunk = conn.recv(4096)
-                if not chunk: break
-                buf += chunk
-                while b'\n' in buf or len(buf) > 2048:
-                    line, buf = (buf.split(b'\n', 1) if b'\n' in buf
-                                 else (buf, b''))
-                    msg = line.decode('utf-8', errors='replace').strip()
-                    if not msg: continue
-                    print(f"[TCP] {addr[0]}: {msg}")
-                    resp = self.brain.process(msg)
-                    conn.sendall((resp + '\n').encode('utf-8'))
+            lines = self._lines(conn)
+            for msg in lines:
+                hello = _hello_frame(msg)
+                if hello is not None:
+                    if self._negotiate(conn, addr, hello) >= 2:
+                        _V2Session(self.brain, conn, addr).run(lines)
+                        break
+                    continue
+                diag = _DIAGNOSTIC.match(msg)
+                if diag:
+                    verb = diag.group(1).lower()
+                    conn.sendall(getattr(self, '_' + verb)(msg))
+                    continue
+                rid = new_request_id()
+                log_event('tcp', 'recv', rid, addr=addr[0], text=msg)
+                t0 = time.time()
+                resp = self.brain.process(msg, rid=rid)
+                log_event('tcp', 'reply', rid,
+                          ms=int((time.time() - t0) * 1000))
+                conn.sendall((resp + '\n').encode('utf-8'))
         except Exception as e:
-            print(f"[TCP] {addr[0]}: {e}")
+            log_event('tcp', 'error', echo=True, addr=addr[0], error=str(e))
         finally:
             conn.close()
 
+    @staticmethod
+    def _lines(conn):
+        """Non-empty lines from conn (overlong lines are cut at 2048 bytes)."""
+        buf = b''
+        while True:
+            chunk = conn.recv(4096)
+            if not chunk: return
+            buf += chunk
+            while b'\n' in buf or len(buf) > 2048:
+                line, buf = (buf.split(b'\n', 1) if b'\n' in buf
+                             else (buf, b''))
+                msg = line.decode('utf-8', errors='replace').strip()
+                if msg: yield msg
+
+    def _negotiate(self, conn, addr, hello):
+        """Answer a hello frame with the version both sides speak."""
+        try:
+            v = max(1, min(int(hello.get('v', TCP_PROTOCOL)), TCP_PROTOCOL))
+        except (TypeError, ValueError):
+            v = 1
+        log_event('tcp', 'hello', addr=addr[0], v=v)
+        conn.sendall((json.dumps({"op": "hello", "v": v, "server": "B-9"})
+                      + '\n').encode('utf-8'))
+        return v
+
+    def _dump(self, msg):
+        """
+        'dump [N] [sub=<subsystem>] [rid=<request id>]' → last N events as
+        JSON lines, terminated by {"end": <count>}.
+        """
+        n, sub, rid = 50, None, None
+        for arg in msg.split()[1:]:
+            if arg.isdigit(): n = int(arg)
+            elif arg.startswith('sub='): sub = arg[4:]
+            elif arg.startswith('rid='): rid = arg[4:]
+        events = dump_events(n, sub, rid)
+        lines  = [json.dumps(e, default=str) for e in events]
+        lines.append(json.dumps({"end": len(events)}))
+        return ('\n'.join(lines) + '\n').encode('utf-8')
+
+    def _profile(self, msg):
+        """
+        'profile [seconds]' → per-thread CPU lines and collapsed stack counts
+        ('# '-prefixed header/CPU lines, pipe the rest to flamegraph.pl).
+        """
+        args = msg.split()[1:]
+        try:
+            secs = float(args[0]) if args else 5.0
+        except ValueError:
+            return b"# bad seconds\n# end\n"
+        if not 0 < secs < float('inf'):
+            return b"# bad seconds\n# end\n"
+        secs = min(secs, PROFILE_MAX_S)
+        if not _profile_lock.acquire(blocking=False):
+            return b"# profiler busy\n# end\n"
+        try:
+            log_event('tcp', 'profile', seconds=secs)
+            stacks, cpu, n = profile(secs)
+        finally:
+            _profile_lock.release()
+        lines = [f"# profile {secs:g}s {n} samples @{PROFILE_HZ}Hz"]
+        lines += [f"# cpu {name} {c:.3f}s" for name, c in
+                  sorted(cpu.items(), key=lambda kv: -kv[1])]
+        lines += [f"{stack} {count}" for stack, count in stacks.most_common()]
+        lines.append("# end")
+        return ('\n'.join(lines) + '\n').encode('utf-8')
+
+    def _threads(self, msg):
+        """'threads' → one JSON line per thread, terminated by {"end": <count>}."""
+        threads = thread_inventory()
+        lines   = [json.dumps(t) for t in threads]
+        lines.append(json.dumps({"end": len(threads)}))
+        return ('\n'.join(lines) + '\n').encode('utf-8')
+
 # ─── Boot Prewarm ─────────────────────────────────────────────────────────────
 def _wait_for_usb_devices():
     """
@@ -755,8 +2381,6 @@ def _wait_for_usb_devices():
     On Jetson, USB devices can take 8-15s to appear after systemd starts b9-robot.
     Polls /proc/asound/cards and /dev/video* until they appear or timeout.
     """
-    global _SPEAKER_CARD, _MIC_CARD, CAMERA_AVAILABLE
-
     print("[BOOT] Waiting for USB devices to enumerate...")
     deadline = time.time() + 20   # max 20s wait
 
@@ -788,58 +2412,65 @@ def _wait_for_usb_devices():
         print("[BOOT] USB device wait timeout - continuing anyway")
 
     # Re-detect audio cards now that USB has had time to enumerate
-    spk, mic = _find_audio_cards()
-    if spk != _SPEAKER_CARD or mic != _MIC_CARD:
-        print(f"[BOOT] Audio re-detected: speaker={spk}  mic={mic} "
-              f"(was speaker={_SPEAKER_CARD}  mic={_MIC_CARD})")
-        _SPEAKER_CARD = spk
-        _MIC_CARD     = mic
+    tts, mic = hw().tts, hw().mic
+    spk, mic_card = _find_audio_cards()
+    if spk != tts.card or mic_card != mic.card:
+        print(f"[BOOT] Audio re-detected: speaker={spk}  mic={mic_card} "
+              f"(was speaker={tts.card}  mic={mic.card})")
+        tts.card = spk
+        mic.card = mic_card
     else:
-        print(f"[BOOT] Audio confirmed: speaker={_SPEAKER_CARD}  mic={_MIC_CARD}")
+        print(f"[BOOT] Audio confirmed: speaker={tts.card}  mic={mic.card}")
 
     # Re-check camera availability
-    if not CAMERA_AVAILABLE:
-        try:
-            for _idx in range(4):
-                _c = cv2.VideoCapture(_idx)
-                if _c.isOpened():
-                    _r, _f = _c.read()
-                    _c.release()
-                    if _r and _f is not None:
-                        CAMERA_AVAILABLE = True
-                        print(f"[BOOT] Camera found: /dev/video{_idx}")
-                        break
-                else:
-                    _c.release()
-        except:
-            pass
+    if not hw().camera.available():
+        hw().camera.refresh()
+
+def _init_hardware():
+    """Bring every backend up now so the boot log shows device status."""
+    h = hw()
+    if h.kind != 'real':
+        print(f"[B-9] Backends: {h.kind}")
+    h.tts
+    h.camera.available()
+    print(f"[B-9] Audio: speaker={h.tts.card}  mic={h.mic.card}")
+    _resolve_models(force=True)
+
 def _prewarm():
     """Load chat model into GPU via the AI worker queue before announcing online."""
-    if not CHAT_MODEL:
+    _resolve_models(force=True)   # boot may block on the probe
+    model = chat_model()
+    if not model:
         return
-    print(f"[BOOT] Pre-warming {CHAT_MODEL}...")
+    print(f"[BOOT] Pre-warming {model}...")
     done = threading.Event()
     result_holder = [None]
     def _cb(r): result_holder[0] = r; done.set()
     submit_chat("Hello.", [], _cb, timeout=60)
     done.wait(timeout=65)
     if result_holder[0]:
-        print(f"[BOOT] {CHAT_MODEL} ready in GPU")
+        print(f"[BOOT] {model} ready in GPU")
     else:
         print(f"[BOOT] Pre-warm timed out (model will load on first request)")
 
 # ─── Main ─────────────────────────────────────────────────────────────────────
 def main():
+    if '--sim' in sys.argv[1:]:
+        use_hardware('sim')
+    print("[B-9] Initializing...")
+    _init_hardware()
     print("\n[B-9] Starting production system...\n")
 
-    brain  = B9Brain()
+    brain  = B9Brain(MemoryStore())
     voice  = VoiceListener(brain)
     keypad = KeypadHandler(voice)
     tcp    = TCPServer(brain)
 
-    # Start AI worker (single consumer for all Ollama calls)
-    ai_thread = threading.Thread(target=ai_worker, daemon=True, name="AI-Worker")
-    ai_thread.start()
+    # Start event log flusher (ring buffer → JSON-lines file)
+    threading.Thread(target=_event_flusher, daemon=True, name="Event-Log").start()
+
+    # Start AI workers (chat + vision lanes, admitted by the memory budget)
+    start_ai_workers()
 
     # Start watchdog (pings Ollama every 30s)
     threading.Thread(target=_watchdog, daemon=True, name="Watchdog").start()
@@ -850,10 +2481,8 @@ def main():
 
     # Wait for USB mic and camera to enumerate (cold boot can take 8-15s)
     # This replaces the need to manually restart b9-robot after boot
-    _wait_for_usb_devices()
-
-    # Update VoiceListener with re-detected mic card
-    voice.mic_card = _MIC_CARD if _MIC_CARD is not None else 1
+    if hw().kind == 'real':
+        _wait_for_usb_devices()
 
     # Pre-warm chat model (goes through AI worker queue)
     # Voice listener starts AFTER prewarm so first command is instant
@@ -862,8 +2491,8 @@ def main():
 
     # All systems ready
     print(f"\n[B-9] Ready.")
-    print(f"[B-9] Chat:       {CHAT_MODEL}")
-    print(f"[B-9] Vision:     {VISION_MODEL or 'NONE'}")
+    print(f"[B-9] Chat:       {chat_model()}")
+    print(f"[B-9] Vision:     {vision_model() or 'NONE'}")
     print(f"[B-9] Wake words: {WAKE_WORDS}")
     print(f"[B-9] TCP port:   5000\n")
 
@@ -872,7 +2501,7 @@ def main():
     # Keep main thread alive, log queue depth every 5 min
     while True:
         time.sleep(300)
-        depth = _ai_queue.qsize()
+        depth = ai_queue_depth()
         if depth > 2:
             print(f"[HEALTH] AI queue depth: {depth} (backpressure)")
 
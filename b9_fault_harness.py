@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+B-9 fault-injection harness
+Runs the real AI worker, watchdog and Ollama restart logic against a local
+Ollama stand-in that misbehaves on command, and measures recovery. The load
+is submitted with an event hook, like the TCP v2 and voice paths, so chats
+take the streaming ("stream": true) route.
+
+  python3 b9_fault_harness.py                     # every scenario
+  python3 b9_fault_harness.py hang drop           # selected scenarios
+  python3 b9_fault_harness.py --json recovery.jsonl
+
+Per scenario it reports time-to-detect, time-to-recover, requests lost and
+user-visible degraded responses. With --json one line per scenario is
+appended (tagged with the git revision) so recovery time can be tracked
+between versions. No systemd, GPU or real Ollama is needed: the restart
+command is pointed at the stand-in's /_fault/restart endpoint.
+"""
+
+import threading, time, json, sys, os, subprocess, argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import b9_complete_system as b9
+
+# ─── Scenarios ────────────────────────────────────────────────────────────────
+# mode:        fault injected after the baseline phase
+# clear_after: seconds until the fault clears by itself (None = only a restart
+#              of the stand-in clears it, like a wedged Ollama)
+SCENARIOS = {
+    "hang":    {"mode": "hang",    "clear_after": None},
+    "http500": {"mode": "http500", "clear_after": None},
+    "empty":   {"mode": "empty",   "clear_after": None},
+    "slow":    {"mode": "slow",    "clear_after": 12},
+    "drop":    {"mode": "drop",    "clear_after": None},
+}
+
+# Harness timings: production values scaled down so a run takes minutes
+TIMINGS = {
+    "OLLAMA_TIMEOUT": 3, "OLLAMA_HEALTH_TIMEOUT": 2, "OLLAMA_RESTART_WAIT": 10,
+    "WATCHDOG_DELAY": 1, "WATCHDOG_INTERVAL": 3, "AI_RETRY_DELAY": 0.5,
+}
+RESTART_DELAY   = 2.0    # seconds the stand-in stays down during a "restart"
+SLOW_BYTE_DELAY = 0.15   # seconds per body byte in "slow" mode
+SLOW_LINE_DELAY = 1.0    # seconds per streamed token line in "slow" mode
+REQUEST_TIMEOUT = 15     # AIRequest staleness timeout used by the load
+
+# ─── Fault-injecting Ollama stand-in ──────────────────────────────────────────
+class FaultyOllama(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.url      = f"http://127.0.0.1:{self.server_address[1]}"
+        self.mode     = 'ok'
+        self.restarts = []          # timestamps of restart requests
+        self._timer   = None
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True,
+                         name="Faulty-Ollama").start()
+
+    def inject(self, mode, clear_after=None):
+        self._cancel_timer()
+        self.mode = mode
+        if clear_after:
+            self._timer = threading.Timer(clear_after, self._set, ('ok',))
+            self._timer.start()
+
+    def restart(self):
+        self.restarts.append(time.time())
+        self._cancel_timer()
+        self.mode   = 'down'
+        self._timer = threading.Timer(RESTART_DELAY, self._set, ('ok',))
+        self._timer.start()
+
+    def handle_error(self, request, client_address):
+        pass    # clients hanging up on injected faults is the point
+
+    def _set(self, mode):
+        self.mode = mode
+
+    def _cancel_timer(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path in ('/api/tags', '/api/ps'):
+            self._serve({"models": []})
+        else:
+            self._send(404, b'{}')
+
+    def do_POST(self):
+        n = int(self.headers.get('Content-Length', 0))
+        try:
+            stream = bool(json.loads(self.rfile.read(n)).get('stream')) if n else False
+        except ValueError:
+            stream = False
+        if self.path == '/_fault/restart':
+            self.server.restart()
+            self._send(200, b'{}')
+        elif self.path == '/api/chat':
+            self._serve({"message": {"role": "assistant",
+                                     "content": "Affirmative. Test reply."},
+                         "done": True}, stream)
+        elif self.path == '/api/generate':
+            self._serve({"response": "A test pattern on a wall.", "done": True},
+                        stream)
+        else:
+            self._send(404, b'{}')
+
+    def _send(self, code, body):
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _serve(self, obj, stream=False):
+        mode = self.server.mode
+        if stream and mode in ('ok', 'empty', 'slow', 'drop'):
+            self._serve_stream(obj, mode)
+        elif mode == 'ok':
+            self._send(200, json.dumps(obj).encode())
+        elif mode == 'hang':
+            while self.server.mode == 'hang':
+                time.sleep(0.1)
+            self.close_connection = True
+        elif mode == 'http500':
+            self._send(500, b'{"error":"injected fault"}')
+        elif mode == 'empty':
+            if 'message' in obj: obj["message"]["content"] = ""
+            if 'response' in obj: obj["response"] = ""
+            self._send(200, json.dumps(obj).encode())
+        elif mode == 'slow':
+            body = json.dumps(obj).encode()
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            for i in range(len(body)):
+                self.wfile.write(body[i:i+1]); self.wfile.flush()
+                time.sleep(SLOW_BYTE_DELAY)
+        else:   # 'drop' and 'down': die mid-body / refuse to answer
+            body = json.dumps(obj).encode()
+            if mode == 'drop':
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body[:len(body) // 2]); self.wfile.flush()
+            self.close_connection = True
+
+    def _serve_stream(self, obj, mode):
+        """One JSON line per token, as Ollama streams; faults hit mid-reply."""
+        key  = 'message' if 'message' in obj else 'response'
+        text = obj["message"]["content"] if key == 'message' else obj["response"]
+        words = [] if mode == 'empty' else [w + ' ' for w in text.split()]
+        lines = [{"message": {"role": "assistant", "content": w}}
+                 if key == 'message' else {"response": w} for w in words]
+        lines.append({"done": True})
+        if mode == 'drop':
+            lines = lines[:len(lines) // 2]    # connection dies mid-stream
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        for line in lines:
+            self.wfile.write(json.dumps(line).encode() + b'\n')
+            self.wfile.flush()
+            if mode == 'slow':
+                time.sleep(SLOW_LINE_DELAY)
+        self.close_connection = True
+
+# ─── Load + measurement ───────────────────────────────────────────────────────
+def _run_scenario(name, spec, srv, baseline, duration, interval):
+    results = []    # [submitted, answered_at, text, aborted reason]
+
+    def _submit():
+        rec = [time.time(), None, None, None]
+        results.append(rec)
+        def _cb(text):
+            rec[1], rec[2] = time.time(), text
+        def _on_event(event, **fields):
+            if event == 'aborted':
+                rec[3] = fields.get('reason')
+        b9.submit_chat("Status report.", [], _cb, timeout=REQUEST_TIMEOUT,
+                       on_event=_on_event)
+
+    srv.inject('ok')
+    srv.restarts.clear()
+    end = time.time() + baseline
+    while time.time() < end:
+        _submit(); time.sleep(interval)
+    t_fault = time.time()
+    srv.inject(spec["mode"], spec["clear_after"])
+    print(f"[HARNESS] {name}: fault injected")
+    end = t_fault + duration
+    while time.time() < end:
+        _submit(); time.sleep(interval)
+
+    # Let in-flight work drain (stale requests are aborted without callback)
+    grace = time.time() + REQUEST_TIMEOUT + 2 * TIMINGS["OLLAMA_TIMEOUT"] + 5
+    while time.time() < grace and (
+            any(q.unfinished_tasks for q in b9._ai_queues.values()) or
+            any(r[1] is None and r[3] is None for r in results)):
+        time.sleep(0.2)
+
+    bad      = (b9.DELAY_RESPONSE, b9.DEGRADED_RESPONSE)
+    after    = [r for r in results if r[0] >= t_fault]
+    degraded = [r for r in results if r[2] in bad]
+    lost     = [r for r in results if r[1] is None]
+    detect   = [r[1] for r in degraded if r[1] >= t_fault] + srv.restarts
+    recover  = [r[1] for r in after if r[2] and r[2] not in bad]
+    return {
+        "scenario":   name,
+        "requests":   len(results),
+        "t_detect":   round(min(detect) - t_fault, 2) if detect else None,
+        "t_recover":  round(min(recover) - t_fault, 2) if recover else None,
+        "lost":       len(lost),
+        "degraded":   len(degraded),
+        "restarts":   len(srv.restarts),
+    }
+
+def _git_rev():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL).strip()
+    except:
+        return "unknown"
+
+def main():
+    ap = argparse.ArgumentParser(description="B-9 fault-injection harness")
+    ap.add_argument('scenarios', nargs='*',
+                    help=f"scenarios to run: {', '.join(SCENARIOS)} (default: all)")
+    ap.add_argument('--baseline', type=float, default=3,
+                    help="seconds of healthy load before the fault")
+    ap.add_argument('--duration', type=float, default=30,
+                    help="seconds of load after the fault is injected")
+    ap.add_argument('--interval', type=float, default=1,
+                    help="seconds between chat requests")
+    ap.add_argument('--json', metavar='FILE',
+                    help="append one JSON line per scenario to FILE")
+    args = ap.parse_args()
+    unknown = [n for n in args.scenarios if n not in SCENARIOS]
+    if unknown:
+        ap.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    srv = FaultyOllama()
+    srv.start()
+    b9.OLLAMA_URL         = srv.url
+    b9.OLLAMA_RESTART_CMD = [
+        sys.executable, '-c',
+        "import sys, urllib.request; urllib.request.urlopen("
+        "urllib.request.Request(sys.argv[1], method='POST'), timeout=5)",
+        f"{srv.url}/_fault/restart"]
+    b9.CHAT_MODEL   = b9.CHAT_MODEL or "fault-chat"
+    b9.VISION_MODEL = b9.VISION_MODEL or "fault-vision"
+    b9.use_hardware('real', tts=b9.SimTTS())   # real HTTP Ollama path, silent
+    for k, v in TIMINGS.items():
+        setattr(b9, k, v)
+
+    b9.start_ai_workers()
+    threading.Thread(target=b9._watchdog, daemon=True, name="Watchdog").start()
+
+    rev  = _git_rev()
+    rows = []
+    for name in args.scenarios or list(SCENARIOS):
+        row = _run_scenario(name, SCENARIOS[name], srv,
+                            args.baseline, args.duration, args.interval)
+        row.update(rev=rev, ts=int(time.time()))
+        rows.append(row)
+        print(f"[HARNESS] {name}: {row}")
+
+    fmt = lambda v: '-' if v is None else str(v)
+    print(f"\n{'scenario':<10}{'detect s':>10}{'recover s':>11}"
+          f"{'lost':>6}{'degraded':>10}{'restarts':>10}{'requests':>10}")
+    for r in rows:
+        print(f"{r['scenario']:<10}{fmt(r['t_detect']):>10}"
+              f"{fmt(r['t_recover']):>11}{r['lost']:>6}{r['degraded']:>10}"
+              f"{r['restarts']:>10}{r['requests']:>10}")
+    if args.json:
+        with open(args.json, 'a') as f:
+            for r in rows:
+                f.write(json.dumps(r) + '\n')
+
+if __name__ == '__main__':
+    main()